@@ -2,18 +2,43 @@
 # -*- coding: utf-8 -*-
 """
 Device Platform Generator
+
+The submodules and their main classes are only imported on first access, so
+that importing this package does not import lxml until a device file is
+actually parsed.
 """
 
-from . import pkg
-from . import exception
-from . import device_file
-from . import device_identifier
-from . import device
-from . import parser
+import importlib
+
+_SUBMODULES = ['exception', 'device_file', 'device_identifier', 'device', 'parser', 'pkg',
+               'device_index', 'database', 'driver_index', 'search', 'solver', 'pinmux',
+               'dma', 'memory_map', 'applicability', 'binary']
 
-from .pkg import naturalkey
-from .exception import ParserException
+_ATTRIBUTES = {
+    'naturalkey': 'pkg',
+    'ParserException': 'exception',
+    'lookup': 'device_index',
+    'Database': 'database',
+    'DeviceSearch': 'search',
+}
 
-__all__ = ['exception', 'device_file', 'device_identifier', 'device', 'parser', 'pkg']
+__all__ = ['exception', 'device_file', 'device_identifier', 'device', 'parser', 'pkg',
+           'device_index', 'lookup', 'database', 'Database', 'driver_index', 'search',
+           'DeviceSearch', 'solver', 'pinmux', 'dma', 'memory_map', 'applicability', 'binary']
 
 __version__ = "0.10.0"
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if name in _ATTRIBUTES:
+        module = importlib.import_module('.' + _ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES) | set(_ATTRIBUTES))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Applicability of the nodes of a device file to its devices.
+
+Answers which devices a node applies to, and which nodes apply to a device,
+without converting any property tree. Every node is stored with the bitmask
+of its devices, which is its `device-*` selectors combined with the masks
+of all its ancestors. The property trees themselves are resolved by
+`DeviceFile.get_properties()`.
+"""
+
+from .device_file import DeviceFile
+
+
+class Applicability:
+    """ Applicability
+    Bitmask of devices for every element of the `<device>` node.
+
+    The bit `i` of a mask belongs to the device `partnames[i]`, which are in
+    the order of `DeviceFile.get_devices()`. The elements are in document
+    order in `nodes` and their masks in `rows`. Comments are not included.
+    """
+    def __init__(self, device_file):
+        devices = device_file.get_devices()
+        self.partnames = [d.partname for d in devices]
+        self.__columns = {partname: index for index, partname in enumerate(self.partnames)}
+
+        # key -> value -> bitmask of devices with this value
+        self.__values = {}
+        for index, device in enumerate(devices):
+            identifier = device._identifier
+            for key in identifier.keys():
+                masks = self.__values.setdefault(key, {})
+                masks[identifier[key]] = masks.get(identifier[key], 0) | (1 << index)
+        self.__selectors = {}
+
+        self.nodes = []
+        self.rows = []
+        self.__index = {}
+        self.__build(device_file.rootnode.find("device"), (1 << len(devices)) - 1)
+
+    def __selector_mask(self, key, values):
+        mask = self.__selectors.get((key, values))
+        if mask is None:
+            masks = self.__values.get(key, {})
+            mask = 0
+            for value in values.split("|"):
+                mask |= masks.get(value, 0)
+            self.__selectors[(key, values)] = mask
+        return mask
+
+    def __build(self, node, mask):
+        prefix = DeviceFile._PREFIX_ATTRIBUTE_DEVICE
+        for key, values in node.attrib.items():
+            if key.startswith(prefix):
+                mask &= self.__selector_mask(key[len(prefix):], values)
+        self.__index[node] = len(self.nodes)
+        self.nodes.append(node)
+        self.rows.append(mask)
+        for child in node:
+            if isinstance(child.tag, str):
+                self.__build(child, mask)
+
+    def mask(self, node):
+        """
+        Returns the bitmask of devices this element applies to.
+        """
+        return self.rows[self.__index[node]]
+
+    def devices(self, node):
+        """
+        Returns the partnames of the devices this element applies to.
+        """
+        mask = self.mask(node)
+        return [p for i, p in enumerate(self.partnames) if mask >> i & 1]
+
+    def column(self, partname):
+        """
+        Returns the elements that apply to this device in document order.
+        """
+        bit = 1 << self.__columns[partname]
+        return [node for node, mask in zip(self.nodes, self.rows) if mask & bit]
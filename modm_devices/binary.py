@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact binary serialization of device files.
+
+The XML tree of a device file is stored as a string table and integer
+arrays, so that loading it is a few array decodes instead of tokenizing the
+XML. All strings, like tags, attribute names and values, are stored once.
+The `device-*` selectors are stored apart from the other attributes, so
+that the precompiled selector tree of the device is built directly from
+the arrays, without an intermediate element tree.
+
+Layout, all integers are 32-bit little-endian:
+
+- `MAGIC`
+- the size and SHA-1 digest of the XML file it was built from, so that it
+  only replaces this XML file while the content is unchanged
+- the number of strings, the size of the string data in bytes, and the
+  number of nodes, attributes and selectors
+- the length of every string in characters, followed by the UTF-8 encoded
+  concatenation of all strings
+- for every node in document order: the tag, the text index + 1 or 0, the
+  parent index + 1 or 0, and the number of attributes and selectors
+- for every attribute in node order: the name and value
+- for every selector in node order: the key without `device-` prefix and
+  the value list
+
+Comments and whitespace between elements are not stored, since the device
+files contain no mixed content.
+"""
+
+import hashlib
+import itertools
+import os
+import struct
+import sys
+
+from array import array
+
+from . import pkg
+from .device_file import DeviceFile, _SelectorNode
+from .exception import ParserException
+
+MAGIC = b"MODMDF\x00\x03"
+SUFFIX = ".bin"
+
+_SOURCE = struct.Struct("<I20s")
+_HEADER = struct.Struct("<IIIII")
+_PREFIX = DeviceFile._PREFIX_ATTRIBUTE_DEVICE
+_HEADER_TAGS = ('naming-schema', DeviceFile._VALID_DEVICE, DeviceFile._INVALID_DEVICE)
+
+
+def filename_of(filename):
+    """
+    Returns the filename of the binary file of this XML device file.
+    """
+    filename = str(filename)
+    if filename.endswith(".xml"):
+        filename = filename[:-len(".xml")]
+    return filename + SUFFIX
+
+
+def _array(data):
+    values = array("I")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class _Node:
+    """
+    Minimal element of a decoded device file with the subset of the
+    lxml.etree element interface used by DeviceFile.
+    """
+    __slots__ = ["tag", "attrib", "text", "children"]
+
+    def __init__(self, tag, attrib, text):
+        self.tag = tag
+        self.attrib = attrib
+        self.text = text
+        self.children = []
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __len__(self):
+        return len(self.children)
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def find(self, tag):
+        return next(self.iterfind(tag), None)
+
+    def iterfind(self, tag):
+        return (child for child in self.children if child.tag == tag)
+
+    def to_etree(self):
+        etree = pkg.import_etree()
+        def convert(node, parent):
+            if parent is None:
+                element = etree.Element(node.tag, node.attrib)
+            else:
+                element = etree.SubElement(parent, node.tag, node.attrib)
+            element.text = node.text
+            for child in node.children:
+                convert(child, element)
+            return element
+        return convert(self, None)
+
+
+def _source(data):
+    return _SOURCE.pack(len(data), hashlib.sha1(data).digest())
+
+
+def dumps(rootnode, source=None):
+    """
+    Serializes the XML tree of a device file, which was parsed from the
+    `source` bytes of the XML file if given.
+    """
+    strings = {}
+    def index(string):
+        return strings.setdefault(string, len(strings))
+
+    nodes = array("I")
+    attributes = array("I")
+    selectors = array("I")
+    def add(element, parent):
+        attrib = []
+        selector = []
+        for key, value in element.attrib.items():
+            if key.startswith(_PREFIX):
+                selector.extend((index(key[len(_PREFIX):]), index(value)))
+            else:
+                attrib.extend((index(key), index(value)))
+        text = element.text
+        node = len(nodes) // 5 + 1
+        nodes.extend((index(element.tag),
+                      index(text) + 1 if text is not None and text.strip() else 0,
+                      parent, len(attrib) // 2, len(selector) // 2))
+        attributes.extend(attrib)
+        selectors.extend(selector)
+        for child in element:
+            if isinstance(child.tag, str):
+                add(child, node)
+    add(rootnode, 0)
+
+    lengths = array("I", (len(s) for s in strings))
+    text = "".join(strings).encode("utf-8")
+    if sys.byteorder == "big":
+        for values in (lengths, nodes, attributes, selectors):
+            values.byteswap()
+    return b"".join((MAGIC,
+                     bytes(_SOURCE.size) if source is None else _source(source),
+                     _HEADER.pack(len(strings), len(text), len(nodes) // 5,
+                                  len(attributes) // 2, len(selectors) // 2),
+                     lengths.tobytes(),
+                     text,
+                     nodes.tobytes(),
+                     attributes.tobytes(),
+                     selectors.tobytes()))
+
+
+class _Data:
+    """
+    The decoded and range checked arrays of a binary device file.
+    """
+    def __init__(self, data):
+        offset = len(MAGIC) + _SOURCE.size + _HEADER.size
+        if data[:len(MAGIC)] != MAGIC or len(data) < offset:
+            raise ParserException("Invalid binary device file format!")
+        nstrings, size, nnodes, nattributes, nselectors = \
+                _HEADER.unpack_from(data, len(MAGIC) + _SOURCE.size)
+        if len(data) != offset + 4 * nstrings + size + 20 * nnodes + 8 * (nattributes + nselectors):
+            raise ParserException("Truncated binary device file!")
+
+        lengths = _array(data[offset:offset + 4 * nstrings])
+        offset += 4 * nstrings
+        # The strings are decoded at once and sliced by their length in characters
+        try:
+            blob = data[offset:offset + size].decode("utf-8")
+        except UnicodeDecodeError as error:
+            raise ParserException("Invalid strings in binary device file: {}".format(error))
+        offset += size
+        bounds = list(itertools.accumulate(lengths))
+        if (bounds[-1] if bounds else 0) != len(blob):
+            raise ParserException("Invalid string table in binary device file!")
+        self.strings = [blob[start:end] for start, end in zip([0] + bounds, bounds)]
+
+        nodes = _array(data[offset:offset + 20 * nnodes])
+        offset += 20 * nnodes
+        attributes = _array(data[offset:offset + 8 * nattributes])
+        offset += 8 * nattributes
+        selectors = _array(data[offset:offset + 8 * nselectors])
+
+        self.tags, texts, self.parents = nodes[0::5], nodes[1::5], nodes[2::5]
+        self.attributes = list(itertools.accumulate(nodes[3::5]))
+        self.selectors = list(itertools.accumulate(nodes[4::5]))
+        # Every node except the root must have a parent before it
+        if (not nnodes or self.parents[0] or
+                self.attributes[-1] != nattributes or self.selectors[-1] != nselectors or
+                any(not parent or parent > index for index, parent in enumerate(self.parents[1:], 1)) or
+                max(itertools.chain(self.tags, attributes, selectors), default=0) >= nstrings or
+                max(texts) > nstrings):
+            raise ParserException("Invalid nodes in binary device file!")
+        self.texts = [self.strings[t - 1] if t else None for t in texts]
+        self.attribute_strings = [self.strings[i] for i in attributes]
+        self.selector_strings = [self.strings[i] for i in selectors]
+
+        # The device node is the first child of the root node
+        self.device = next((index for index, parent in enumerate(self.parents)
+                            if parent == 1 and self.strings[self.tags[index]] == "device"), None)
+        if self.device is None:
+            raise ParserException("Missing device node in binary device file!")
+
+    def attrib(self, index, prefix=""):
+        start = self.attributes[index - 1] if index else 0
+        attrib = dict(zip(self.attribute_strings[2 * start:2 * self.attributes[index]:2],
+                          self.attribute_strings[2 * start + 1:2 * self.attributes[index]:2]))
+        if prefix is None:
+            return attrib
+        start = self.selectors[index - 1] if index else 0
+        selectors = {prefix + k: v for k, v in
+                     zip(self.selector_strings[2 * start:2 * self.selectors[index]:2],
+                         self.selector_strings[2 * start + 1:2 * self.selectors[index]:2])}
+        selectors.update(attrib)
+        return selectors
+
+    def nodes(self, indices=None):
+        """
+        Builds the tree of nodes from these indices or all nodes, where the
+        selectors are attributes again.
+        """
+        nodes = {}
+        root = None
+        for index in (range(len(self.tags)) if indices is None else indices):
+            node = _Node(self.strings[self.tags[index]], self.attrib(index, _PREFIX),
+                         self.texts[index])
+            parent = nodes.get(self.parents[index] - 1)
+            if parent is not None:
+                parent.children.append(node)
+            elif root is None:
+                root = node
+            nodes[index] = node
+        return root
+
+    def selector_tree(self):
+        """
+        Builds the precompiled selector tree of the device node bottom-up.
+        """
+        inside = [False] * len(self.tags)
+        inside[self.device] = True
+        for index in range(self.device + 1, len(self.tags)):
+            inside[index] = inside[self.parents[index] - 1]
+
+        values = {}
+        children = {}
+        for index in range(len(self.tags) - 1, self.device - 1, -1):
+            if not inside[index]:
+                continue
+            parent = self.parents[index] - 1
+            tag = self.strings[self.tags[index]]
+            if parent == self.device and tag in _HEADER_TAGS:
+                continue
+            start = self.selectors[index - 1] if index else 0
+            selectors = []
+            for position in range(2 * start, 2 * self.selectors[index], 2):
+                value = self.selector_strings[position + 1]
+                if value not in values:
+                    values[value] = frozenset(value.split("|"))
+                selectors.append((self.selector_strings[position], values[value]))
+            nodes = children.pop(index, [])
+            nodes.reverse()
+            node = _SelectorNode.create(tag, tuple(selectors), self.attrib(index, None), nodes)
+            if index == self.device:
+                return node
+            children.setdefault(parent, []).append(node)
+
+
+class BinaryDeviceFile(DeviceFile):
+    """ BinaryDeviceFile
+    A device file that was loaded from its binary serialization.
+
+    The selector tree of the device is built from the arrays directly. The
+    element tree is only built for the `rootnode`, and only XPath queries
+    convert it into an lxml tree.
+    """
+    def __init__(self, filename, data):
+        DeviceFile.__init__(self, filename)
+        self.__data = data
+        self.__header = None
+        self.__device_node = None
+        self.__xml = None
+
+    @property
+    def rootnode(self):
+        if self._rootnode is None:
+            self._rootnode = self.__data.nodes()
+        return self._rootnode
+
+    def _get_device_header(self):
+        if self.__header is None:
+            data = self.__data
+            indices = [data.device] + [i for i, parent in enumerate(data.parents)
+                                       if parent - 1 == data.device and
+                                          data.strings[data.tags[i]] in _HEADER_TAGS]
+            self.__header = data.nodes(indices)
+        return self.__header
+
+    def _get_device_node(self):
+        if self.__device_node is None:
+            self.__device_node = self.__data.selector_tree()
+        return self.__device_node
+
+    def query(self, identifier, path):
+        if self.__xml is None:
+            self.__xml = DeviceFile(self.filename, self.rootnode.to_etree())
+        return self.__xml.query(identifier, path)
+
+
+def loads(data, filename=None):
+    """
+    Decodes a serialized device file.
+    """
+    return BinaryDeviceFile(filename, _Data(data))
+
+
+def load(filename, xml_filename=None):
+    """
+    Loads the binary device file, which is named after the XML device file
+    `xml_filename` if given.
+    """
+    try:
+        with open(filename, "rb") as binary_file:
+            data = binary_file.read()
+    except OSError as error:
+        raise ParserException(error)
+    return loads(data, filename if xml_filename is None else xml_filename)
+
+
+def is_current(filename):
+    """
+    Returns True if the binary file of this XML device file exists and was
+    built from the current content of the XML file. The file times are not
+    compared, since installing and copying the files does not keep them.
+    """
+    try:
+        with open(filename_of(filename), "rb") as binary_file:
+            header = binary_file.read(len(MAGIC) + _SOURCE.size)
+        if len(header) != len(MAGIC) + _SOURCE.size or header[:len(MAGIC)] != MAGIC:
+            return False
+        size, _ = _SOURCE.unpack_from(header, len(MAGIC))
+        # Only hash the XML file if its size matches
+        if size != os.path.getsize(str(filename)):
+            return False
+        with open(str(filename), "rb") as xml_file:
+            return _source(xml_file.read()) == header[len(MAGIC):]
+    except OSError:
+        return False
+
+
+def dump(rootnode, filename, source_filename=None):
+    """
+    Writes the binary file of the XML tree, which was parsed from the XML
+    file `source_filename` if given.
+    """
+    source = None
+    if source_filename is not None:
+        with open(str(source_filename), "rb") as xml_file:
+            source = xml_file.read()
+    with open(filename, "wb") as binary_file:
+        binary_file.write(dumps(rootnode, source))
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Loader for the whole device database.
+
+Parses all device files once, resolves the properties of every device and
+stores them in an on-disk snapshot. Subsequent loads unpickle the snapshot
+and only parse the device files that changed since.
+"""
+
+import os
+import glob
+import pickle
+import hashlib
+import logging
+
+from . import pkg
+from .device import Device
+from .device_file import DeviceFile
+from .driver_index import DriverIndex
+
+LOGGER = logging.getLogger('modm_devices.database')
+
+
+def default_cache_path(filenames=None):
+    """
+    Returns the default snapshot path of all shipped device files, or of
+    this set of device files, so that different sets never evict each other.
+    """
+    cache = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    name = "database.pickle"
+    if filenames is not None:
+        digest = hashlib.sha1("\n".join(filenames).encode("utf-8")).hexdigest()
+        name = "database-{}.pickle".format(digest[:16])
+    return os.path.join(cache, "modm-devices", name)
+
+
+class Database:
+    """ Database
+    All devices of a set of device files with their properties resolved.
+
+    Arguments:
+        filenames: The device files to load, defaults to all shipped files.
+        cache: The path of the snapshot file, `True` for the default path of
+               this set of files, or `None` to disable the on-disk cache.
+               The snapshot only keeps the entries of these files.
+    """
+    VERSION = 4
+
+    def __init__(self, filenames=None, cache=True):
+        shipped = filenames is None
+        if shipped:
+            root = pkg.get_filename('modm_devices', 'resources/devices')
+            filenames = glob.glob(os.path.join(root, "**", "*.xml"), recursive=True)
+        self.filenames = sorted(os.path.realpath(str(f)) for f in filenames)
+        if cache is True:
+            cache = default_cache_path(None if shipped else self.filenames)
+        self.cache = cache
+
+        self.device_files = {}
+        self.devices = {}
+        self._driver_entries = {}
+        self._drivers = None
+        self._load()
+
+    @staticmethod
+    def _stamp(filename):
+        stat = os.stat(filename)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read_cache(self):
+        if self.cache is None or not os.path.exists(self.cache):
+            return {}
+        try:
+            with open(self.cache, "rb") as cache_file:
+                snapshot = pickle.load(cache_file)
+        except Exception as error:
+            LOGGER.warning("Ignoring invalid database cache '%s': %s", self.cache, error)
+            return {}
+        if not isinstance(snapshot, dict) or snapshot.get("version") != self.VERSION:
+            return {}
+        return snapshot["files"]
+
+    def _write_cache(self, files):
+        try:
+            os.makedirs(os.path.dirname(self.cache), exist_ok=True)
+            # Write atomically, so that concurrent loads never see a partial file
+            tmpfile = "{}.{}".format(self.cache, os.getpid())
+            with open(tmpfile, "wb") as cache_file:
+                pickle.dump({"version": self.VERSION, "files": files},
+                            cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpfile, self.cache)
+        except OSError as error:
+            LOGGER.warning("Cannot write database cache '%s': %s", self.cache, error)
+
+    def _load(self):
+        files = self._read_cache()
+        changed = False
+        parser = None
+
+        for filename in self.filenames:
+            stamp = self._stamp(filename)
+            entry = files.get(filename)
+            if entry is not None and entry[0] == stamp:
+                # Restore the devices without parsing the file, their
+                # properties are only unpickled when they are accessed.
+                device_file = _CachedDeviceFile(filename, entry[1], entry[2])
+                devices = [Device(identifier, device_file) for identifier in entry[1]]
+                self._driver_entries[filename] = entry[3]
+            else:
+                LOGGER.debug("Parsing '%s'", filename)
+                if parser is None:
+                    from .parser import DeviceParser
+                    parser = DeviceParser()
+                device_file = parser.parse(filename)
+                devices = device_file.get_devices()
+                properties = pickle.dumps([d.properties for d in devices],
+                                          protocol=pickle.HIGHEST_PROTOCOL)
+                drivers = DriverIndex.entries(devices)
+                files[filename] = (stamp, [d._identifier for d in devices], properties, drivers)
+                self._driver_entries[filename] = drivers
+                changed = True
+
+            self.device_files[filename] = device_file
+            for device in devices:
+                self.devices[device.partname] = device
+
+        # Drop the entries of removed, renamed or other device files
+        stale = set(files).difference(self.filenames)
+        for filename in stale:
+            del files[filename]
+
+        if (changed or stale) and self.cache is not None:
+            self._write_cache(files)
+
+    @property
+    def drivers(self):
+        """
+        The DriverIndex of all devices, which is built from the cached
+        index entries of every device file.
+        """
+        if self._drivers is None:
+            self._drivers = DriverIndex()
+            for filename in self.filenames:
+                self._drivers.update(self._driver_entries[filename])
+        return self._drivers
+
+    def get(self, partname, default=None):
+        return self.devices.get(partname, default)
+
+    def __getitem__(self, partname):
+        return self.devices[partname]
+
+    def __contains__(self, partname):
+        return partname in self.devices
+
+    def __iter__(self):
+        return iter(self.devices.values())
+
+    def __len__(self):
+        return len(self.devices)
+
+
+class _CachedDeviceFile(DeviceFile):
+    """
+    A device file restored from the database cache, which unpickles the
+    properties of all its devices on first access.
+    """
+    def __init__(self, filename, identifiers, properties):
+        DeviceFile.__init__(self, filename)
+        self._identifiers = identifiers
+        self._pickled_properties = properties
+
+    def __unpickle(self):
+        if self._pickled_properties is not None:
+            properties = pickle.loads(self._pickled_properties)
+            for did, props in zip(self._identifiers, properties):
+                self._add_properties(did, props)
+            self._pickled_properties = None
+
+    def get_properties(self, identifier):
+        self.__unpickle()
+        return DeviceFile.get_properties(self, identifier)
+
+    def get_drivers(self, identifier, name):
+        # The cache contains no XML, so the drivers come from the properties
+        self.__unpickle()
+        return DeviceFile.get_drivers(self, identifier, name)
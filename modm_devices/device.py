@@ -5,9 +5,6 @@
 # Copyright (c) 2016, Niklas Hauser
 # All rights reserved.
 
-import copy
-import itertools
-
 from .exception import ParserException
 from .device_identifier import DeviceIdentifier
 
@@ -22,6 +19,8 @@ class Device:
         self.device_file = device_file
 
         self._properties = None
+        self._drivers = {}
+        self._signals = None
 
     def __parse_properties(self):
         """
@@ -30,35 +29,98 @@ class Device:
         if self._properties is None:
             self._properties = self.device_file.get_properties(self._identifier)
 
+    def __get_drivers(self, name):
+        """
+        Resolve the drivers with this name on first access, without
+        converting the rest of the property tree. The drivers are cached by
+        name and by (name, type).
+        """
+        drivers = self._drivers.get(name)
+        if drivers is None:
+            if self._properties is not None:
+                drivers = [d for d in self._properties["driver"] if d["name"] == name]
+            else:
+                drivers = self.device_file.get_drivers(self._identifier, name)
+            self._drivers[name] = drivers
+        return drivers
+
     @property
     def properties(self):
+        """
+        The read-only property tree of this device.
+        Use `properties.copy()` to get a mutable copy.
+        """
         self.__parse_properties()
-        return copy.deepcopy(self._properties)
+        return self._properties
 
     @property
     def identifier(self):
         return self._identifier.copy()
 
+    @property
+    def signals(self):
+        """
+        The read-only signal index of the gpio driver, which maps
+        (driver, instance, signal name) to the list of pins with this signal.
+        The driver or instance is None for signals without them.
+
+        Every pin is a dict of the pin `port` and `pin` and the remaining
+        signal attributes, like the alternate function number `af`. Signals
+        of the STM32F1 remap groups carry the `remap` group id, all signals
+        of an instance must use the same group.
+        """
+        if self._signals is None:
+            gpio = self.get_driver("gpio") or {}
+            self._signals = self.device_file._get_signal_index(
+                    gpio.get("gpio", []), gpio.get("remap", []))
+        return self._signals
+
+    def get_signal_pins(self, driver, instance, name):
+        """
+        Returns the list of pins with this signal, see `signals`.
+        """
+        instance = None if instance is None else str(instance)
+        return list(self.signals.get((driver, instance, name), []))
+
+    def query(self, path):
+        """
+        Evaluates an XPath expression against the device file, relative to
+        the `<device>` node, without converting the property tree.
+        Only nodes that belong to this device are returned, for example:
+
+            device.query("driver[@name='gpio']/gpio/signal[@driver='usart'][@instance='2']")
+
+        Returns:
+            A list of read-only attribute dicts for elements and strings for
+            attribute values and texts.
+        """
+        return self.device_file.query(self._identifier, path)
+
     def get_all_drivers(self, name):
-        self.__parse_properties()
+        """
+        Returns a list of the read-only driver property trees matching the
+        `name`, `name:type` or `name:type-prefix*` pattern.
+        """
         parts = name.split(":")
-        results = []
 
         if len(parts) == 1:
-            results = [d for d in self._properties["driver"] if d["name"] == parts[0]]
+            results = self.__get_drivers(parts[0])
         elif len(parts) == 2:
-            find_all = (parts[1][-1] == '*')
-            for driver in self._properties["driver"]:
-                if driver["name"] == parts[0] and \
-                        ((find_all and driver["type"].startswith(parts[1][:-1])) or
-                        (not find_all and driver["type"] == parts[1])):
-                    results.append(driver)
+            if parts[1][-1] == '*':
+                results = [d for d in self.__get_drivers(parts[0])
+                           if d["type"].startswith(parts[1][:-1])]
+            else:
+                results = self._drivers.get((parts[0], parts[1]))
+                if results is None:
+                    results = [d for d in self.__get_drivers(parts[0])
+                               if d["type"] == parts[1]]
+                    self._drivers[(parts[0], parts[1])] = results
         else:
             raise ParserException("Invalid driver name '{}'. "
                                   "The name must contain no or one ':' to "
                                   "separate type and name.".format(name))
 
-        return copy.deepcopy(results)
+        return list(results)
 
     def get_driver(self, name):
         results = self.get_all_drivers(name)
@@ -5,15 +5,16 @@
 # Copyright (c) 2016, Niklas Hauser
 # All rights reserved.
 
-import lxml.etree
+import itertools
 
 from collections import defaultdict
 
+from . import pkg
 from .device import Device
-from .device_identifier import DeviceIdentifier
-from .device_identifier import MultiDeviceIdentifier
+from .device_identifier import DeviceIdentifier, NamingSchema
 
 from .exception import ParserException
+from .properties import FrozenDict, FrozenList
 
 class DeviceFile:
     _PREFIX_ATTRIBUTE = 'attribute-'
@@ -21,34 +22,95 @@ class DeviceFile:
     _INVALID_DEVICE = 'invalid-device'
     _VALID_DEVICE = 'valid-device'
 
+    __xpaths = {}
 
-    def __init__(self, filename, rootnode):
+    def __init__(self, filename, rootnode=None):
         self.filename = filename
-        self.rootnode = rootnode
+        self._rootnode = rootnode
+        self.__device_node = None
+        self.__properties = {}
+        self.__signal_indices = {}
+        self.__applicability = None
 
-    def _get_multi_device_identifier(self, node, naming_schema):
-        properties = {k:v.split("|") for k,v in node.attrib.items()}
-        return MultiDeviceIdentifier.from_product(properties, naming_schema)
+    @property
+    def rootnode(self):
+        """
+        The XML root node, which is parsed on first access if the device file
+        was constructed without one.
+        """
+        if self._rootnode is None:
+            from .parser import DeviceParser
+            parser = DeviceParser()
+            self._rootnode = parser.validate_and_parse_xml(self.filename, parser.xsdfile)
+        return self._rootnode
 
-    def get_devices(self):
+    def _add_properties(self, identifier: DeviceIdentifier, properties):
         """
-        Return a list of devices which are covered by this device file.
+        Prefill the property cache, so that the rootnode is not required.
         """
-        device_node = self.rootnode.find('device')
-        naming_schema_string = device_node.find('naming-schema').text
-        identifiers = self._get_multi_device_identifier(device_node, naming_schema_string)
+        self.__properties[identifier._ustring] = properties
+
+    def _get_device_header(self):
+        """
+        Returns the device node, whose attributes and naming-schema,
+        valid-device and invalid-device children define the devices.
+        """
+        return self.rootnode.find('device')
+
+    def _iter_identifiers(self):
+        device_node = self._get_device_header()
+        naming_schema = device_node.find('naming-schema').text
+        properties = {k:v.split("|") for k,v in device_node.attrib.items()}
 
         # Not all combinations which can be generated through the
         # naming schema are valid. Grab the list of excluded device names
         # to remove those from the constructed devices.
-        invalid_devices = [node.text for node in device_node.iterfind(self._INVALID_DEVICE)]
-        valid_devices = [node.text for node in device_node.iterfind(self._VALID_DEVICE)]
-        devices = identifiers
-        if len(invalid_devices):
-            devices = [did for did in devices if did.string not in invalid_devices]
-        if len(valid_devices):
-            devices = [did for did in devices if did.string in valid_devices]
-        return [Device(did, self) for did in devices]
+        invalid_devices = {node.text for node in device_node.iterfind(self._INVALID_DEVICE)}
+        valid_devices = {node.text for node in device_node.iterfind(self._VALID_DEVICE)}
+        remaining = len(valid_devices)
+
+        schema = NamingSchema(naming_schema, properties)
+        if remaining and schema.is_parsable:
+            # Parse the valid devices directly instead of searching the product
+            identifiers = [did for did in schema.parse_all(valid_devices - invalid_devices) if did is not None]
+            indices = {k: {v: i for i, v in enumerate(values)} for k, values in properties.items()}
+            identifiers.sort(key=lambda did: tuple(indices[k][did[k]] for k in properties))
+            yield from identifiers
+            return
+
+        keys = list(properties.keys())
+        for values in itertools.product(*properties.values()):
+            identifier = DeviceIdentifier(naming_schema)
+            for key, value in zip(keys, values):
+                identifier.set(key, value)
+            string = identifier.string
+            if string in invalid_devices:
+                continue
+            if len(valid_devices):
+                if string not in valid_devices:
+                    continue
+                yield identifier
+                # stop as soon as all valid devices have been found
+                remaining -= 1
+                if not remaining:
+                    return
+            else:
+                yield identifier
+
+    def iter_devices(self):
+        """
+        Yield the devices which are covered by this device file in naming
+        schema order, without constructing all of them upfront.
+        """
+        for identifier in self._iter_identifiers():
+            yield Device(identifier, self)
+
+    def get_devices(self):
+        """
+        Return a list of devices which are covered by this device file.
+        """
+        identifiers = sorted(self._iter_identifiers(), key=lambda did: did._ustring)
+        return [Device(did, self) for did in identifiers]
 
     @staticmethod
     def is_valid(node, identifier: DeviceIdentifier):
@@ -63,58 +125,219 @@ class DeviceFile:
         properties = {k.replace(DeviceFile._PREFIX_ATTRIBUTE_DEVICE, ''):node.attrib[k].split("|") for k in device_keys}
         return not any(identifier[key] not in value for key, value in properties.items())
 
+    def _get_device_node(self):
+        """
+        Compile the device node into its selector form once per file.
+        """
+        if self.__device_node is None:
+            ignored = [DeviceFile._VALID_DEVICE, DeviceFile._INVALID_DEVICE, 'naming-schema']
+            self.__device_node = _SelectorNode(self.rootnode.find("device"), ignored)
+        return self.__device_node
+
+    def get_applicability(self):
+        """
+        Returns the cached Applicability of the nodes of this file to its
+        devices, which is only used to query the nodes.
+        """
+        if self.__applicability is None:
+            from .applicability import Applicability
+            self.__applicability = Applicability(self)
+        return self.__applicability
+
     def get_properties(self, identifier: DeviceIdentifier):
-        class Converter:
-            """
-            """
-            def __init__(self, identifier: DeviceIdentifier):
-                self.identifier = identifier
-
-            def is_valid(self, node):
-                ignored = [DeviceFile._VALID_DEVICE, DeviceFile._INVALID_DEVICE, 'naming-schema']
-                if (node.getparent().getparent().getparent() is None and
-                    node.getparent().tag == 'device' and
-                    node.tag in ignored):
-                    return False
-                return DeviceFile.is_valid(node, self.identifier)
-
-            def strip_attrib(self, node):
-                stripped_keys = filter(lambda k: not k.startswith(DeviceFile._PREFIX_ATTRIBUTE_DEVICE), node.attrib.keys())
-                if node.getparent().getparent() is None and node.tag == 'device':
-                    stripped_keys = filter(lambda k: k not in self.identifier.keys(), stripped_keys)
-                return {k:node.attrib[k] for k in stripped_keys}
-
-            def to_dict(self, t):
-                if isinstance(t, lxml.etree._Comment):
-                    # Remove comments in the XML file from the generated dict.
-                    return {}
-                attrib = self.strip_attrib(t)
-                d = {t.tag: {} if len(attrib) else None}
-                children = []
-                for c in t:
-                    if self.is_valid(c):
-                        children.append(c)
-                if children:
-                    dd = defaultdict(list)
-                    for dc in map(self.to_dict, children):
-                        for k, v in dc.items():
-                            dd[k].append(v)
-                    dk = {}
-                    for k, v in dd.items():
-                        if k.startswith(DeviceFile._PREFIX_ATTRIBUTE):
-                            if len(v) > 1:
-                                raise ParserException("Attribute '{}' cannot be a list!".format(k))
-                            k = k.replace(DeviceFile._PREFIX_ATTRIBUTE, '')
-                            v = v[0]
-                        dk[k] = v
-                    d = {t.tag: dk}
-                if list(attrib.keys()) == ['value']:
-                    d[t.tag] = attrib['value']
-                elif len(attrib):
-                    if any(k in d[t.tag] for k in attrib.keys()):
-                        raise ParserException("Node children are overwriting attribute '{}'!".format(k))
-                    d[t.tag].update(attrib.items())
-                return d
-
-        properties = Converter(identifier).to_dict(self.rootnode.find("device"))
-        return properties["device"]
+        """
+        Returns the property tree of the device with this identifier.
+
+        The result is cached per identifier and shares unchanged subtrees with
+        the other devices of this file, so it is read-only.
+        """
+        properties = self.__properties.get(identifier._ustring)
+        if properties is None:
+            device_node = self._get_device_node()
+            attrib = {k:v for k,v in device_node.attrib.items() if k not in identifier.keys()}
+            properties = device_node.to_dict(identifier, attrib)
+            self.__properties[identifier._ustring] = properties
+        return properties
+
+    def get_drivers(self, identifier: DeviceIdentifier, name):
+        """
+        Returns the list of property trees of the drivers with this name of
+        the device with this identifier.
+
+        Only the matching driver nodes are converted, unless the whole
+        property tree of this device is already cached. The drivers are the
+        same read-only objects as in the property tree.
+        """
+        properties = self.__properties.get(identifier._ustring)
+        if properties is not None:
+            return [d for d in properties["driver"] if d["name"] == name]
+        return [child.to_dict(identifier) for child in self._get_device_node().children
+                if child.tag == "driver" and child.attrib.get("name") == name and
+                   child.is_valid(identifier)]
+
+    @staticmethod
+    def _xpath(path):
+        """
+        Returns the cached compiled XPath expression.
+        """
+        xpath = DeviceFile.__xpaths.get(path)
+        if xpath is None:
+            etree = pkg.import_etree()
+            try:
+                xpath = etree.XPath(path)
+            except etree.XPathSyntaxError as error:
+                raise ParserException("Invalid query '{}': {}".format(path, error))
+            DeviceFile.__xpaths[path] = xpath
+        return xpath
+
+    def query(self, identifier: DeviceIdentifier, path):
+        """
+        Evaluates the XPath expression relative to the `<device>` node and
+        returns the results that are valid for the device with this
+        identifier, so that the node and all its ancestors match the device.
+
+        Elements are returned as read-only dicts of their attributes without
+        the selectors, attribute values and texts as strings. Other results,
+        like numbers, are returned unfiltered.
+        """
+        device_node = self.rootnode.find("device")
+        results = DeviceFile._xpath(path)(device_node)
+        if not isinstance(results, list):
+            return results
+
+        valid = {}
+        def is_valid(node):
+            # Memoized by identity, the node is kept alive so its id stays unique
+            key = id(node)
+            if key not in valid:
+                parent = node.getparent()
+                valid[key] = (node, DeviceFile.is_valid(node, identifier) and
+                              (parent is None or is_valid(parent)))
+            return valid[key][1]
+
+        prefix = DeviceFile._PREFIX_ATTRIBUTE_DEVICE
+        values = []
+        for result in results:
+            if isinstance(result, str):
+                if result.getparent() is None or is_valid(result.getparent()):
+                    values.append(str(result))
+            elif isinstance(result.tag, str) and is_valid(result):
+                values.append(FrozenDict((k, v) for k, v in result.attrib.items()
+                                         if not k.startswith(prefix)))
+        return values
+
+    def _get_signal_index(self, pins, remaps=()):
+        """
+        Returns the signal index of this list of gpio pins and remap groups.
+
+        The converted pins are shared between the devices of this file, so
+        the index is cached by the identity of the pins and shared between
+        all devices with the same pins.
+        """
+        signature = tuple(id(pin) for pin in pins) + (None,) + tuple(id(remap) for remap in remaps)
+        cached = self.__signal_indices.get(signature)
+        if cached is None:
+            index = defaultdict(list)
+            def add(key, port, pin, signal, extra=None):
+                entry = {"port": port, "pin": pin}
+                entry.update(extra or {})
+                entry.update((k, v) for k, v in signal.items()
+                             if k not in ("driver", "instance", "name", "port", "pin"))
+                index[key].append(FrozenDict(entry))
+
+            for pin in pins:
+                for signal in pin.get("signal", []):
+                    key = (signal.get("driver"), signal.get("instance"), signal["name"])
+                    add(key, pin["port"], pin["pin"], signal)
+            # The STM32F1 remap groups select the pins of all signals of an
+            # instance at once, so every entry carries its group id.
+            for remap in remaps:
+                for group in remap.get("group", []):
+                    for signal in group.get("signal", []):
+                        key = (remap.get("driver"), remap.get("instance"), signal["name"])
+                        add(key, signal["port"], signal["pin"], signal, {"remap": group["id"]})
+            index = FrozenDict((k, FrozenList(v)) for k, v in index.items())
+            # keep the pins alive, so that their identity stays unique
+            cached = self.__signal_indices[signature] = ((pins, remaps), index)
+        return cached[1]
+
+
+class _SelectorNode:
+    """
+    Precompiled form of a device file node.
+
+    The `device-*` selector attributes are parsed once into sets, and the
+    converted subtree is memoized by the identifier values of all selectors
+    below this node, so devices that select the same children share it.
+    """
+    __slots__ = ["tag", "selectors", "attrib", "children", "keys", "_cache"]
+
+    def __init__(self, node, ignored=None):
+        prefix = DeviceFile._PREFIX_ATTRIBUTE_DEVICE
+        selectors = tuple((k.replace(prefix, ''), frozenset(v.split("|")))
+                          for k,v in node.attrib.items() if k.startswith(prefix))
+        attrib = {k:v for k,v in node.attrib.items() if not k.startswith(prefix)}
+        # Comments in the XML file are removed from the generated dict
+        children = [_SelectorNode(c) for c in node
+                    if isinstance(c.tag, str) and
+                       (ignored is None or c.tag not in ignored)]
+        self._init(node.tag, selectors, attrib, children)
+
+    @staticmethod
+    def create(tag, selectors, attrib, children):
+        """
+        Builds the node from its already parsed parts, for example from a
+        binary device file.
+        """
+        node = _SelectorNode.__new__(_SelectorNode)
+        node._init(tag, selectors, attrib, children)
+        return node
+
+    def _init(self, tag, selectors, attrib, children):
+        self.tag = tag
+        self.selectors = selectors
+        self.attrib = attrib
+        self.children = children
+        keys = set()
+        for child in self.children:
+            keys.update(k for k, _ in child.selectors)
+            keys.update(child.keys)
+        self.keys = tuple(sorted(keys))
+        self._cache = {}
+
+    def is_valid(self, identifier: DeviceIdentifier):
+        return all(identifier[key] in values for key, values in self.selectors)
+
+    def to_dict(self, identifier: DeviceIdentifier, attrib=None):
+        if attrib is not None:
+            return self._convert(identifier, attrib)
+        key = tuple(identifier[k] for k in self.keys)
+        if key not in self._cache:
+            self._cache[key] = self._convert(identifier, self.attrib)
+        return self._cache[key]
+
+    def _convert(self, identifier, attrib):
+        value = {} if len(attrib) else None
+        children = [c for c in self.children if c.is_valid(identifier)]
+        if children:
+            dd = defaultdict(list)
+            for child in children:
+                dd[child.tag].append(child.to_dict(identifier))
+            value = {}
+            for k, v in dd.items():
+                if k.startswith(DeviceFile._PREFIX_ATTRIBUTE):
+                    if len(v) > 1:
+                        raise ParserException("Attribute '{}' cannot be a list!".format(k))
+                    k = k.replace(DeviceFile._PREFIX_ATTRIBUTE, '')
+                    v = v[0]
+                else:
+                    v = FrozenList(v)
+                value[k] = v
+        if list(attrib.keys()) == ['value']:
+            return attrib['value']
+        if len(attrib):
+            for k in attrib.keys():
+                if k in value:
+                    raise ParserException("Node children are overwriting attribute '{}'!".format(k))
+            value.update(attrib.items())
+        return value if value is None else FrozenDict(value)
@@ -5,22 +5,161 @@
 # All rights reserved.
 
 import re
+import sys
 import logging
-import copy
 import itertools
 import string
 
 from collections import OrderedDict, defaultdict
 from .exception import DeviceIdentifierException
 
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+class NamingSchema:
+    """ NamingSchema
+    A naming schema compiled once into a formatter and, with the possible
+    values of every key, into a reverse parser from partnames to
+    identifiers.
+
+    Keys that are not part of the schema must have a single value to be
+    parsable. If several value combinations format to the same partname,
+    the parser returns only one of them.
+    """
+    __formatters = {}
+
+    def __init__(self, schema, values=None):
+        self.schema = schema
+        self.values = values
+        self.__fields = []
+        self.__regex = None
+
+        template = []
+        for literal, field, spec, conversion in string.Formatter().parse(schema):
+            template.append(literal.replace("%", "%%"))
+            if field is None:
+                continue
+            if spec or conversion or not field.isidentifier():
+                # Only plain fields are compiled, everything else is formatted
+                # by the string.Formatter
+                template = None
+                break
+            template.append("%s")
+            self.__fields.append(field)
+        self.__template = "".join(template) if template is not None else None
+
+    @staticmethod
+    def get(schema):
+        """
+        Returns the cached formatter for this naming schema.
+        """
+        formatter = NamingSchema.__formatters.get(schema)
+        if formatter is None:
+            formatter = NamingSchema.__formatters[schema] = NamingSchema(schema)
+        return formatter
+
+    @property
+    def keys(self):
+        return list(OrderedDict.fromkeys(self.__fields))
+
+    def format(self, properties):
+        if self.__template is None:
+            return string.Formatter().vformat(self.schema, (), defaultdict(str, **properties))
+        return self.__template % tuple(properties.get(k, "") for k in self.__fields)
+
+    @property
+    def is_parsable(self):
+        return self.__template is not None and self.values is not None and \
+            all(len(v) == 1 for k, v in self.values.items() if k not in self.__fields)
+
+    def _regex(self):
+        if self.__regex is None:
+            if not self.is_parsable:
+                raise DeviceIdentifierException(
+                    "Naming schema '{}' cannot be parsed with values '{}'!".format(self.schema, self.values))
+            pattern = []
+            groups = set()
+            for literal, field, _, _ in string.Formatter().parse(self.schema):
+                pattern.append(re.escape(literal))
+                if field is None:
+                    continue
+                if field in groups:
+                    pattern.append("(?P={})".format(field))
+                    continue
+                groups.add(field)
+                values = self.values.get(field)
+                if values is None:
+                    choices = ".*?"
+                else:
+                    # Prefer the longest value, the match is backtracked anyways
+                    choices = "|".join(re.escape(v) for v in sorted(values, key=len, reverse=True))
+                pattern.append("(?P<{}>{})".format(field, choices))
+            self.__regex = re.compile("".join(pattern))
+        return self.__regex
+
+    def parse(self, partname):
+        """
+        Returns the DeviceIdentifier of this partname, or None if the
+        partname does not match this naming schema.
+        """
+        return self.__from_match(self._regex().fullmatch(partname))
+
+    def parse_all(self, partnames):
+        """
+        Parses a batch of partnames.
+
+        Returns:
+            A list of DeviceIdentifier, with None for unmatched partnames.
+        """
+        fullmatch = self._regex().fullmatch
+        return [self.__from_match(fullmatch(partname)) for partname in partnames]
+
+    def __from_match(self, match):
+        if match is None:
+            return None
+        groups = match.groupdict()
+        identifier = DeviceIdentifier(self.schema)
+        # Set the keys in the order of the values, then the schema
+        for key in self.values:
+            identifier.set(key, groups[key] if key in groups else self.values[key][0])
+        for key, value in groups.items():
+            if key not in self.values:
+                identifier.set(key, value)
+        return identifier
+
+
 class DeviceIdentifier:
+    """ DeviceIdentifier
+    The identifier values of a single device.
+
+    Keys, values and the naming schema are interned strings. Copies share
+    their properties until one of them is modified, so `copy()` is cheap.
+    """
+    __slots__ = ("__naming_schema", "_properties", "__shared",
+                 "__string", "__ustring", "__hash")
+
     def __init__(self, naming_schema=None):
-        self.naming_schema = naming_schema
+        self.__naming_schema = _intern(naming_schema)
         self._properties = OrderedDict()
+        self.__shared = False
         self.__string = None
         self.__ustring = None
         self.__hash = None
 
+    @property
+    def naming_schema(self):
+        return self.__naming_schema
+
+    @naming_schema.setter
+    def naming_schema(self, naming_schema):
+        self.__naming_schema = _intern(naming_schema)
+        self.__invalidate()
+
+    def __invalidate(self):
+        self.__hash = None
+        self.__string = None
+        self.__ustring = None
+
     @property
     def _ustring(self):
         if self.__ustring is None:
@@ -29,11 +168,14 @@ class DeviceIdentifier:
         return self.__ustring
 
     def copy(self):
-        identifier = DeviceIdentifier(self.naming_schema)
-        identifier._properties = copy.deepcopy(self._properties)
+        identifier = DeviceIdentifier.__new__(DeviceIdentifier)
+        identifier.__naming_schema = self.__naming_schema
+        identifier._properties = self._properties
         identifier.__string = self.__string
         identifier.__ustring = self.__ustring
         identifier.__hash = self.__hash
+        # Both copies must copy the properties before modifying them
+        identifier.__shared = self.__shared = True
         return identifier
 
     def keys(self):
@@ -46,15 +188,15 @@ class DeviceIdentifier:
             raise DeviceIdentifierException("Naming schema is missing!")
         # Use the naming schema to generate the string
         if self.__string is None:
-            self.__string = string.Formatter().vformat(
-                    self.naming_schema, (), defaultdict(str, **self._properties))
+            self.__string = NamingSchema.get(self.naming_schema).format(self._properties)
         return self.__string
 
     def set(self, key, value):
-        self.__hash = None
-        self.__string = None
-        self.__ustring = None
-        self._properties[key] = value
+        self.__invalidate()
+        if self.__shared:
+            self._properties = OrderedDict(self._properties)
+            self.__shared = False
+        self._properties[_intern(key)] = _intern(value)
 
     def get(self, key, default=None):
         return self._properties.get(key, default)
@@ -63,13 +205,17 @@ class DeviceIdentifier:
         return self.get(key, None)
 
     def __getattr__(self, attr):
+        # Private and special attributes are never properties, this also
+        # keeps pickle and copy from recursing on partially restored objects
+        if attr.startswith("_"):
+            raise AttributeError(attr)
         val = self.get(attr, None)
         if val is None:
             raise AttributeError("'{}' has no property '{}'".format(repr(self), attr))
         return val
 
     def __eq__(self, other):
-        return self._ustring == other._ustring
+        return self is other or self._ustring == other._ustring
 
     def __ne__(self, other):
         return not self == other
@@ -86,61 +232,122 @@ class DeviceIdentifier:
         return self.string if self.naming_schema else "DeviceId({})".format(self._ustring)
 
 
+class _IdentifierUniverse:
+    """ _IdentifierUniverse
+    Interns DeviceIdentifiers into a process-wide table, so that sets of
+    identifiers can be stored as bitmasks of their indices.
+
+    The table stores its own copies, so that modifying an identifier after
+    adding it to a set does not change the set.
+    """
+    def __init__(self):
+        self.index = {}
+        self.ids = []
+
+    def intern(self, did):
+        pos = self.index.get(did)
+        if pos is None:
+            pos = len(self.ids)
+            did = did.copy()
+            self.index[did] = pos
+            self.ids.append(did)
+        return pos
+
+    def mask(self, dids):
+        mask = 0
+        for did in dids:
+            mask |= 1 << self.intern(did)
+        return mask
+
+    def bit(self, did):
+        pos = self.index.get(did)
+        return 0 if pos is None else 1 << pos
+
+    def members(self, mask):
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(self.ids[low.bit_length() - 1])
+            mask ^= low
+        return ids
+
+_UNIVERSE = _IdentifierUniverse()
+
+
 class MultiDeviceIdentifier:
     """ MultiDeviceIdentifier
-    Encapsulates a list of DeviceIdentifier.
+    Encapsulates a set of DeviceIdentifier.
     This manages filtering, merging and accessing.
+
+    The set is stored as a bitmask over a shared table of interned
+    identifiers, so that union, intersection and comparison are integer
+    operations. `ids` is sorted by the unique identifier string.
     """
     def __init__(self, objs=None):
+        self._mask = 0
         self._ids = []
         self.__string = None
         self.__naming_schema = None
-        self.__dirty = True
+        self.__bitsets = None
+        self.__hash = None
+        self.__keys = None
+        self.__columns = {}
 
         if isinstance(objs, DeviceIdentifier):
-            self._ids = [objs.copy()]
+            self._mask = _UNIVERSE.mask([objs])
         if isinstance(objs, (list, set, tuple)):
-            for obj in objs:
-                if isinstance(objs, DeviceIdentifier):
-                    self._ids.append(objs)
+            self._mask = _UNIVERSE.mask(obj for obj in objs if isinstance(obj, DeviceIdentifier))
         if isinstance(objs, MultiDeviceIdentifier):
-            self._ids = [dev for dev in objs.ids]
+            self._mask = objs._mask
+            self._ids = objs._ids
+            self.__keys = objs.__keys
+            self.__columns = dict(objs.__columns)
+        if self._mask and not self._ids:
+            self._ids = None
 
     @property
     def ids(self):
-        if self.__dirty:
-            self._ids = sorted(list(set(self._ids)), key=lambda d: d._ustring)
-            self.__dirty = False
+        if self._ids is None:
+            self._ids = sorted(_UNIVERSE.members(self._mask), key=lambda d: d._ustring)
         return self._ids
 
+    def __update(self, mask):
+        if mask != self._mask:
+            self._mask = mask
+            self._ids = None
+            self.__bitsets = None
+            self.__hash = None
+            self.__keys = None
+            self.__columns = {}
+            self.__string = None
+            self.__naming_schema = None
 
     def copy(self):
-        ids = MultiDeviceIdentifier.from_list(self.ids)
+        ids = MultiDeviceIdentifier(self)
         ids.__string = self.__string
         ids.__naming_schema = self.__naming_schema
         return ids
 
     @staticmethod
     def from_list(device_ids: list):
-        mid = MultiDeviceIdentifier()
-        mid._ids = [dev for dev in device_ids]
-        return mid
+        return MultiDeviceIdentifier(list(device_ids))
 
     def append(self, did):
         assert isinstance(did, DeviceIdentifier)
-
-        self._ids.append(did)
-        self.__dirty = True
-        self.__string = None
-        self.__naming_schema = None
+        self.__update(self._mask | 1 << _UNIVERSE.intern(did))
 
     def extend(self, dids):
         assert isinstance(dids, (MultiDeviceIdentifier, list))
+        if isinstance(dids, MultiDeviceIdentifier):
+            self.__update(self._mask | dids._mask)
+        else:
+            self.__update(self._mask | _UNIVERSE.mask(dids))
 
-        self._ids.extend(dids)
-        self.__dirty = True
-        self.__string = None
-        self.__naming_schema = None
+    def intersection(self, others):
+        assert isinstance(others, MultiDeviceIdentifier)
+        ids = MultiDeviceIdentifier()
+        ids.__update(self._mask & others._mask)
+        return ids
 
     @property
     def string(self):
@@ -174,14 +381,15 @@ class MultiDeviceIdentifier:
 
     @staticmethod
     def from_product(properties, naming_schema):
-        attributes = list(itertools.product(*properties.values()))
-        ids = MultiDeviceIdentifier()
-        for attr in attributes:
+        keys = list(properties.keys())
+        idents = []
+        for attr in itertools.product(*properties.values()):
             ident = DeviceIdentifier(naming_schema)
-            for ii, k in enumerate(properties.keys()):
-                ident.set(k, attr[ii])
-            ids.append(ident)
-        return ids
+            for k, v in zip(keys, attr):
+                ident.set(k, v)
+            idents.append(ident)
+        # Intern all identifiers at once instead of growing the mask
+        return MultiDeviceIdentifier(idents)
 
     def minimal_subtract(self, complete, others):
         assert isinstance(complete, MultiDeviceIdentifier)
@@ -209,30 +417,67 @@ class MultiDeviceIdentifier:
     def minimal_invertible_subtract(self, complete, others):
         if (len(self.ids) * 2 > len(complete.ids)):
             # invert it
-            ids_inv = complete.copy()
-            ids_inv.__string = None
-            ids_inv._ids = [did for did in ids_inv.ids if did not in self.ids]
+            ids_inv = MultiDeviceIdentifier()
+            ids_inv.__update(complete._mask & ~self._mask)
             return (ids_inv.minimal_subtract(complete, others), -1)
         else:
             return (self.minimal_subtract(complete, others), 1)
 
+    def _key_bitsets(self):
+        """
+        Returns the bitmask of identifiers for every value of every key.
+        """
+        if self.__bitsets is None:
+            bitsets = defaultdict(lambda: defaultdict(int))
+            keys = self.keys()
+            for did in self.ids:
+                bit = _UNIVERSE.bit(did)
+                for k in keys:
+                    bitsets[k][did[k]] |= bit
+            self.__bitsets = bitsets
+        return self.__bitsets
+
     def minimal_subtract_set(self, complete, parent):
         assert isinstance(complete, MultiDeviceIdentifier)
 
-        def partly_inside(mkeys, ids, did):
-            return any( all( cid[k] == did[k] for k in mkeys ) for cid in ids )
+        ids = self.ids
+        keys = self.keys()
 
         def minimal_keys():
-            keys = [k for k in self.keys() if not all( all(s[k] == p[k] for p in parent) for s in self)]
-            for clength in range(len(keys)):
-                for kcomb in itertools.combinations(keys, clength):
+            # Only keep the keys that do not have the same single value in
+            # both this set and the parent set
+            mkeys = []
+            for k in keys:
+                values = {s[k] for s in ids}
+                if len(ids) and len(parent) and not (
+                        len(values) == 1 and all(p[k] in values for p in parent)):
+                    mkeys.append(k)
+
+            bitsets = complete._key_bitsets()
+            self_bits = self._mask
+            if self_bits & ~complete._mask:
+                # complete can never be filtered down to this set
+                self_bits = None
+
+            for clength in range(len(mkeys)):
+                for kcomb in itertools.combinations(mkeys, clength):
                     if not clength:
-                        filtered = parent
-                    else:
-                        filtered = complete.filter(lambda i: partly_inside(kcomb, self, i))
-                    if filtered == self:
+                        if parent == self:
+                            return kcomb
+                        continue
+                    if self_bits is None:
+                        continue
+                    # all identifiers of complete, that share the values of
+                    # these keys with any identifier of this set
+                    filtered = 0
+                    for values in {tuple(s[k] for k in kcomb) for s in ids}:
+                        bits = -1
+                        for k, v in zip(kcomb, values):
+                            bits &= bitsets[k].get(v, 0)
+                        filtered |= bits
+                    if filtered == self_bits:
                         return kcomb
-            return keys
+            return mkeys
 
         def filtered_by_keys(mkeys, ids):
             nids = MultiDeviceIdentifier()
@@ -243,43 +488,62 @@ class MultiDeviceIdentifier:
                     nids.append(ident)
             return nids
 
-        def product_inside(mkeys, ids, did):
-            nids = ids.copy()
-            nids.append(did)
-            pids = filtered_by_keys(mkeys, nids).product()
-            return all( partly_inside(mkeys, self, i) for i in pids )
-
         mkeys = minimal_keys()
-
-        cids = [ MultiDeviceIdentifier() ]
-        for did in self:
-            for ids in cids:
-                if product_inside(mkeys, ids, did):
-                    ids.append(did)
+        inside = {tuple(s[k] for k in mkeys) for s in ids}
+
+        def product_inside(values, did):
+            # The product of all key values without None must be inside this
+            # set, a key without any values is None in the product.
+            dims = []
+            size = 1
+            for kvalues, k in zip(values, mkeys):
+                kvalues = {v for v in kvalues if v is not None}
+                if did[k] is not None:
+                    kvalues.add(did[k])
+                dims.append(kvalues or {None})
+                size *= len(dims[-1])
+            if size > len(inside):
+                return False
+            return all(p in inside for p in itertools.product(*dims))
+
+        # Greedily group the identifiers into boxes of key values
+        groups = []
+        for did in ids:
+            for members, values in groups:
+                if product_inside(values, did):
+                    members.append(did)
+                    for kvalues, k in zip(values, mkeys):
+                        kvalues.add(did[k])
                     break
             else:
-                cids.append( MultiDeviceIdentifier(did) )
+                groups.append(([did], [{did[k]} for k in mkeys]))
 
-        fids = [filtered_by_keys(mkeys, ids) for ids in cids]
+        # An empty set is a single empty group
+        if not groups:
+            groups.append(([], []))
+
+        fids = [filtered_by_keys(mkeys, MultiDeviceIdentifier.from_list(members))
+                for members, _ in groups]
         fids.sort(key=lambda d: d.string)
         return fids
 
     def filter(self, filter_fn):
-        ids = MultiDeviceIdentifier()
-
+        mask = 0
         for did in self.ids:
             if filter_fn(did):
-                ids.append(did)
+                mask |= _UNIVERSE.bit(did)
 
+        ids = MultiDeviceIdentifier()
+        ids.__update(mask)
         return ids
 
     def keys(self):
-        keys = []
-        for ident in self.ids:
-            for k in ident.keys():
-                if k not in keys:
-                    keys.append(k)
-        return keys
+        if self.__keys is None:
+            keys = OrderedDict()
+            for ident in self.ids:
+                keys.update(dict.fromkeys(ident.keys()))
+            self.__keys = list(keys)
+        return list(self.__keys)
 
     def items(self):
         items = {}
@@ -301,16 +565,22 @@ class MultiDeviceIdentifier:
         return self.__naming_schema
 
     def remove(self, device_id):
-        self.ids.remove(device_id)
+        bit = _UNIVERSE.bit(device_id)
+        if not self._mask & bit:
+            raise ValueError("'{}' is not in '{}'".format(repr(device_id), repr(self)))
+        self.__update(self._mask & ~bit)
 
     def __contains__(self, other):
         if isinstance(other, DeviceIdentifier):
-            return any(other == dev for dev in self.ids)
+            pos = _UNIVERSE.index.get(other)
+            return pos is not None and bool(self._mask >> pos & 1)
         if isinstance(other, MultiDeviceIdentifier):
-            return all(did in self for did in other)
+            return not other._mask & ~self._mask
         return NotImplemented
 
     def __eq__(self, others):
+        if isinstance(others, MultiDeviceIdentifier):
+            return self._mask == others._mask
         return set(others.ids) == set(self.ids)
 
     def __iter__(self):
@@ -324,21 +594,31 @@ class MultiDeviceIdentifier:
         return len(self.ids)
 
     def __hash__(self):
-        return sum(hash(did) for did in self.ids)
+        if self.__hash is None:
+            self.__hash = hash(self._mask)
+        return self.__hash
+
+    def __reduce__(self):
+        # The bitmask is only valid within this process
+        return (MultiDeviceIdentifier, (list(self.ids),))
 
     def getAttribute(self, name):
-        if '@' in name:
-            attr = [getattr(i, name[1:]) for i in self.ids]
-        else:
-            attr = [i[name] for i in self.ids]
-
-        attr = [a for a in attr if a is not None]
-        attr = list(set(attr))
-        try:
-            attr.sort(key=int)
-        except:
-            attr.sort()
-        return attr
+        # The sorted values of every attribute are cached until modification
+        attr = self.__columns.get(name)
+        if attr is None:
+            if '@' in name:
+                attr = {getattr(i, name[1:]) for i in self.ids}
+            else:
+                attr = {i[name] for i in self.ids}
+
+            attr.discard(None)
+            attr = list(attr)
+            try:
+                attr.sort(key=int)
+            except:
+                attr.sort()
+            self.__columns[name] = attr
+        return list(attr)
 
     def __str__(self):
         return self.string
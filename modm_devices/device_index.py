@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Partname index over all shipped device files.
+
+The index maps every partname to its device file and identifier values, so
+that a single device can be resolved by parsing only the file it lives in.
+It is generated by `tools/scripts/sync_docs.py` together with the README.
+"""
+
+import os
+import json
+
+from . import pkg
+from .device import Device
+from .device_identifier import DeviceIdentifier
+from .exception import ParserException
+
+
+class DeviceIndex:
+    """ DeviceIndex
+    Maps partnames to (device file, naming schema, identifier values).
+
+    The file paths are stored relative to the `devices/` folder.
+    """
+    VERSION = 1
+
+    def __init__(self, files=None, devices=None, root=None):
+        # list of (relative path, naming schema, identifier keys)
+        self.files = files if files is not None else []
+        # partname -> [file index, identifier values...]
+        self.devices = devices if devices is not None else {}
+        self.root = root if root is not None else \
+            pkg.get_filename('modm_devices', 'resources/devices')
+        self._device_files = {}
+
+    @staticmethod
+    def from_device_files(device_files, root):
+        """
+        Build the index from parsed DeviceFiles, whose filenames must be
+        located inside the `root` folder.
+        """
+        index = DeviceIndex(root=root)
+        for device_file in device_files:
+            path = os.path.relpath(str(device_file.filename), str(root)).replace(os.sep, '/')
+            findex = len(index.files)
+            keys = None
+            for device in device_file.get_devices():
+                identifier = device.identifier
+                if keys is None:
+                    keys = list(identifier.keys())
+                    index.files.append((path, identifier.naming_schema, keys))
+                index.devices[device.partname] = [findex] + [identifier[k] for k in keys]
+        return index
+
+    @staticmethod
+    def from_file(filename, root=None):
+        with open(str(filename), 'r') as index_file:
+            content = json.load(index_file)
+        if content.get("version") != DeviceIndex.VERSION:
+            raise ParserException("Device index '{}' has unsupported version '{}'!"
+                                  .format(filename, content.get("version")))
+        files = [tuple(f) for f in content["files"]]
+        return DeviceIndex(files, content["devices"], root)
+
+    def write(self, filename):
+        # One entry per line keeps the diff of the generated index readable
+        def dumps(obj):
+            return json.dumps(obj, separators=(',', ':'))
+        files = ",\n".join(dumps(list(f)) for f in self.files)
+        devices = ",\n".join("{}:{}".format(dumps(k), dumps(self.devices[k]))
+                             for k in sorted(self.devices))
+        with open(str(filename), 'w') as index_file:
+            index_file.write('{{"version":{},\n"files":[\n{}],\n"devices":{{\n{}}}}}\n'
+                             .format(self.VERSION, files, devices))
+
+    def filename(self, partname):
+        """
+        Returns the absolute path to the device file covering this partname,
+        or None if the partname is unknown.
+        """
+        entry = self.devices.get(partname)
+        if entry is None:
+            return None
+        return os.path.join(self.root, self.files[entry[0]][0])
+
+    def identifier(self, partname):
+        entry = self.devices.get(partname)
+        if entry is None:
+            return None
+        _, naming_schema, keys = self.files[entry[0]]
+        identifier = DeviceIdentifier(naming_schema)
+        for key, value in zip(keys, entry[1:]):
+            identifier.set(key, value)
+        return identifier
+
+    def lookup(self, partname):
+        """
+        Resolves a single device by parsing only its device file.
+        Device files are cached, so looking up several devices of the same
+        file only parses it once.
+
+        Returns:
+            The Device or None if the partname is unknown.
+        """
+        identifier = self.identifier(partname)
+        if identifier is None:
+            return None
+        filename = self.filename(partname)
+        device_file = self._device_files.get(filename)
+        if device_file is None:
+            from .parser import DeviceParser
+            device_file = DeviceParser().parse(filename)
+            self._device_files[filename] = device_file
+        return Device(identifier, device_file)
+
+    def __contains__(self, partname):
+        return partname in self.devices
+
+    def __iter__(self):
+        return iter(sorted(self.devices))
+
+    def __len__(self):
+        return len(self.devices)
+
+
+INDEXFILE = pkg.get_filename('modm_devices', 'resources/index.json')
+_DEFAULT_INDEX = None
+
+def default_index():
+    """
+    Returns the index shipped with this package.
+    """
+    global _DEFAULT_INDEX
+    if _DEFAULT_INDEX is None:
+        _DEFAULT_INDEX = DeviceIndex.from_file(INDEXFILE)
+    return _DEFAULT_INDEX
+
+def lookup(partname):
+    """
+    Returns the Device for this partname using the shipped index, or None
+    if the partname is unknown.
+    """
+    return default_index().lookup(partname)
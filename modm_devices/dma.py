@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DMA allocation solver on top of the STM32 `dma` driver of a device.
+
+Every requested signal is a `(driver, instance, name)` tuple, like
+`("usart", 2, "tx")` or `("adc", 1, None)`, and is allocated one DMA
+resource that can serve this signal, so that no resource is used twice:
+
+- `stm32-stream-channel`: a stream of a DMA instance with a channel
+  selection, allocated as `{"instance", "stream", "channel"}`.
+- `stm32-channel`: a channel of a DMA instance, allocated as
+  `{"instance", "channel"}`.
+- `stm32-channel-request`: a channel of a DMA instance with a request
+  selection, allocated as `{"instance", "channel", "request"}`.
+- `stm32-channel`, `stm32-mux` and `stm32-mux-stream` with DMAMUX: a
+  DMAMUX channel with the request ID, allocated as
+  `{"mux-channel", "request", "instance", "channel"}`.
+
+The resources are encoded as bits of an occupancy mask and assigned by
+`solver.assign()`. Other DMA drivers do not list their requests, so no
+signal can be allocated on them.
+"""
+
+from collections import defaultdict
+
+from .solver import assign, assign_all, signal_key
+
+
+def _resources(dma, keys):
+    """
+    Returns a dict of the signal keys to the list of (resource, allocation).
+    """
+    resources = defaultdict(list)
+    if dma is None:
+        return resources
+
+    def signal_keys(request):
+        for signal in request.get("signal", []):
+            key = (signal["driver"], signal.get("instance"), signal.get("name"))
+            if key in keys:
+                yield key
+
+    if "streams" in dma:
+        for streams in dma["streams"]:
+            for stream in streams.get("stream", []):
+                resource = ("stream", streams["instance"], stream["position"])
+                for channel in stream.get("channel", []):
+                    allocation = {"instance": streams["instance"], "stream": stream["position"],
+                                  "channel": channel["position"]}
+                    for key in signal_keys(channel):
+                        resources[key].append((resource, allocation))
+
+    if "channels" in dma:
+        for channels in dma["channels"]:
+            for channel in channels.get("channel", []):
+                resource = ("channel", channels["instance"], channel["position"])
+                # Channels without request selection list their signals directly
+                for request in channel.get("request", [channel]):
+                    allocation = {"instance": channels["instance"], "channel": channel["position"]}
+                    if request is not channel:
+                        allocation["request"] = request["position"]
+                    for key in signal_keys(request):
+                        resources[key].append((resource, allocation))
+
+    if "mux-channels" in dma:
+        mux_channels = [c for mc in dma["mux-channels"] for c in mc.get("mux-channel", [])]
+        for requests in dma.get("requests", []):
+            for request in requests.get("request", []):
+                for key in signal_keys(request):
+                    # Every request can be routed to every DMAMUX channel
+                    for mux_channel in mux_channels:
+                        resource = ("mux-channel", mux_channel["position"])
+                        allocation = {"mux-channel": mux_channel["position"],
+                                      "request": request["position"],
+                                      "instance": mux_channel["dma-instance"],
+                                      "channel": mux_channel["dma-channel"]}
+                        resources[key].append((resource, allocation))
+
+    return resources
+
+
+def _problem(device, keys):
+    resources = _resources(device.get_driver("dma"), set(keys))
+    bits = {}
+    candidates = []
+    for key in keys:
+        candidates.append([(1 << bits.setdefault(resource, len(bits)), allocation)
+                           for resource, allocation in resources.get(key, [])])
+    return candidates
+
+
+def _result(signals, keys, assignment):
+    allocations = dict(zip(keys, assignment))
+    return {signal: allocations[signal_key(signal)] for signal in signals}
+
+
+def solve(device, signals):
+    """
+    Finds a conflict-free DMA allocation for every requested signal.
+
+    Arguments:
+        device: The Device.
+        signals: A list of (driver, instance, name) tuples, the instance or
+                 name is None for signals without them.
+
+    Returns:
+        A dict of every requested signal to its allocation dict, or None if
+        there is no conflict-free allocation.
+    """
+    keys = list(dict.fromkeys(signal_key(signal) for signal in signals))
+    assignment = assign(_problem(device, keys))
+    if assignment is None:
+        return None
+    return _result(signals, keys, assignment)
+
+
+def solve_all(devices, signals, jobs=1):
+    """
+    Solves the same request for many devices, optionally in a pool of `jobs`
+    processes.
+
+    Returns:
+        A dict of the partnames of all feasible devices to their allocation,
+        see `solve()`.
+    """
+    keys = list(dict.fromkeys(signal_key(signal) for signal in signals))
+    problems = []
+    for device in devices:
+        candidates = _problem(device, keys)
+        if all(candidates):
+            problems.append((device.partname, candidates, 0))
+
+    results = assign_all(problems, jobs)
+    return {partname: _result(signals, keys, assignment)
+            for partname, assignment in results if assignment is not None}
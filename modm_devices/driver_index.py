@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Inverted index from drivers and their instances to partnames.
+
+The index is built from the property trees of the devices, and the
+Database stores the index of every device file in its on-disk cache, so
+that queries never need to parse or unpickle any device data.
+"""
+
+from collections import defaultdict
+
+from .exception import ParserException
+from .pkg import naturalkey
+
+
+class DriverIndex:
+    """ DriverIndex
+    Maps (driver name, driver type, instance) to the set of partnames.
+
+    Every device with a driver is listed under the instance `None` as well,
+    so that drivers without instances can be queried too.
+    """
+    def __init__(self):
+        # name -> (type, instance) -> set of partnames
+        self._index = defaultdict(lambda: defaultdict(set))
+
+    @staticmethod
+    def entries(devices):
+        """
+        Returns the index entries of these devices as a dict of
+        (name, type, instance) to a list of partnames.
+        """
+        entries = defaultdict(list)
+        for device in devices:
+            for driver in device.properties["driver"]:
+                key = (driver["name"], driver["type"])
+                entries[key + (None,)].append(device.partname)
+                for instance in driver.get("instance", []):
+                    entries[key + (instance,)].append(device.partname)
+        return dict(entries)
+
+    @staticmethod
+    def from_devices(devices):
+        index = DriverIndex()
+        index.update(DriverIndex.entries(devices))
+        return index
+
+    def update(self, entries):
+        for (name, dtype, instance), partnames in entries.items():
+            self._index[name][(dtype, instance)].update(partnames)
+
+    def names(self):
+        return sorted(self._index)
+
+    def types(self, name):
+        return sorted({dtype for dtype, _ in self._index.get(name, {})})
+
+    def instances(self, name):
+        """
+        Returns the sorted instances of all drivers matching the `name`,
+        `name:type` or `name:type-prefix*` pattern.
+        """
+        instances = {instance for _, instance in self.__keys(name) if instance is not None}
+        return sorted(instances, key=naturalkey)
+
+    def __keys(self, name):
+        parts = name.split(":")
+        if len(parts) > 2:
+            raise ParserException("Invalid driver name '{}'. "
+                                  "The name must contain no or one ':' to "
+                                  "separate type and name.".format(name))
+        keys = self._index.get(parts[0], {})
+        if len(parts) == 1:
+            return list(keys)
+        if parts[1].endswith('*'):
+            return [k for k in keys if k[0].startswith(parts[1][:-1])]
+        return [k for k in keys if k[0] == parts[1]]
+
+    def find(self, name, instance=None):
+        """
+        Returns the sorted partnames of all devices with a driver matching
+        the `name`, `name:type` or `name:type-prefix*` pattern, and with
+        this driver instance if given.
+        """
+        instance = None if instance is None else str(instance)
+        drivers = self._index.get(name.split(":")[0], {})
+        partnames = set()
+        for key in self.__keys(name):
+            if key[1] == instance:
+                partnames.update(drivers[key])
+        return sorted(partnames)
+
+    def __contains__(self, name):
+        return name in self._index
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Address to region index for the memory map of a device.
+
+The regions are flattened into a sorted array of boundaries, where every
+interval between two boundaries belongs to the smallest region covering
+it. Looking up an address is then a single binary search, which is done
+in C by the `bisect` module, also for many addresses at once.
+"""
+
+import bisect
+import functools
+
+
+def _int(value):
+    return value if isinstance(value, int) else int(value, 0)
+
+
+class MemoryMap:
+    """ MemoryMap
+    Maps addresses to the regions of a memory map.
+
+    A region is any dict with a `start` and `size`, like the memories of
+    the `core` driver. Regions may overlap, in which case an address belongs
+    to the smallest region containing it.
+    """
+    def __init__(self, regions=None):
+        self.regions = list(regions or [])
+        self._bounds = None
+        self._regions = None
+        self._lookup = None
+
+    @staticmethod
+    def from_device(device, peripherals=None):
+        """
+        Builds the memory map from the memories of the device `core` driver.
+
+        The device files do not contain the peripheral addresses, so these
+        can be added as `peripherals`, a list of dicts with a `name`, `start`
+        and `size`, for example from the CMSIS headers.
+
+        Memories without a `start` address are skipped, like the separate
+        flash, ram and eeprom address spaces of the AVR devices, whose
+        memory map is therefore empty.
+        """
+        core = device.get_driver("core")
+        regions = [m for m in (core or {}).get("memory", []) if "start" in m]
+        regions.extend(peripherals or [])
+        return MemoryMap(regions)
+
+    def add(self, region):
+        self.regions.append(region)
+        self._bounds = None
+
+    def __build(self):
+        intervals = [(_int(r["start"]), _int(r["start"]) + _int(r["size"]), r)
+                     for r in self.regions if _int(r["size"])]
+        points = sorted({p for start, end, _ in intervals for p in (start, end)})
+        # The smallest region covering every elementary interval
+        segments = []
+        for start, end in zip(points, points[1:]):
+            covering = [(e - s, index) for index, (s, e, _) in enumerate(intervals)
+                        if s <= start and end <= e]
+            segments.append(intervals[min(covering)[1]][2] if covering else None)
+
+        # Merge neighbouring intervals of the same region
+        bounds, regions = [], [None]
+        for point, region in zip(points, segments + [None]):
+            if region is not regions[-1]:
+                bounds.append(point)
+                regions.append(region)
+        self._bounds = bounds
+        self._regions = regions
+        self._lookup = functools.partial(bisect.bisect_right, self._bounds)
+
+    def lookup(self, address):
+        """
+        Returns the region containing this address or None.
+        """
+        if self._bounds is None:
+            self.__build()
+        return self._regions[self._lookup(address)]
+
+    def lookup_all(self, addresses):
+        """
+        Returns the list of regions containing these addresses, with None
+        for addresses outside of all regions.
+        """
+        if self._bounds is None:
+            self.__build()
+        return list(map(self._regions.__getitem__, map(self._lookup, addresses)))
@@ -7,40 +7,67 @@
 XML parser for the modm files.
 """
 
+import logging
+
 from . import pkg
+from . import binary
 from .device_file import DeviceFile
 
 from .exception import ParserException
 
 # lxml must be imported **after** the Catalog file have been set by 'pkg', otherwise
 # it runs into an endless loop during verification.
-import lxml.etree
+etree = pkg.import_etree()
+
+LOGGER = logging.getLogger('modm_devices.parser')
 
 
 class Parser:
-    def __init__(self, xsdfile):
+    # The compiled XML schemas are shared by all parsers of this process
+    _schemas = {}
+
+    def __init__(self, xsdfile, validate=False):
         self.xsdfile = xsdfile
+        self.validate = validate
 
     @staticmethod
-    def validate_and_parse_xml(filename, xsdfile):
+    def get_schema(xsdfile):
+        """
+        Returns the compiled XML schema, which is only compiled once.
+        """
+        schema = Parser._schemas.get(xsdfile)
+        if schema is None:
+            try:
+                parser = etree.XMLParser(no_network=True)
+                xmlschema = etree.parse(xsdfile, parser=parser)
+                schema = etree.XMLSchema(xmlschema)
+            except OSError as error:
+                raise ParserException(error)
+            except (etree.XMLSyntaxError,
+                    etree.XMLSchemaParseError) as error:
+                raise ParserException("While parsing '{}':"
+                                      " {}".format(xsdfile, error))
+            Parser._schemas[xsdfile] = schema
+        return schema
+
+    @staticmethod
+    def validate_and_parse_xml(filename, xsdfile, validate=False):
         try:
             # parse the xml-file
-            parser = lxml.etree.XMLParser(no_network=True)
-            xmlroot = lxml.etree.parse(filename, parser=parser)
+            parser = etree.XMLParser(no_network=True)
+            xmlroot = etree.parse(filename, parser=parser)
             xmlroot.xinclude()
 
-            xmlschema = lxml.etree.parse(xsdfile, parser=parser)
-
-            schema = lxml.etree.XMLSchema(xmlschema)
-            # schema.assertValid(xmlroot)
+            if validate:
+                Parser.get_schema(xsdfile).assertValid(xmlroot)
 
             rootnode = xmlroot.getroot()
         except OSError as error:
             raise ParserException(error)
-        except (lxml.etree.DocumentInvalid,
-                lxml.etree.XMLSyntaxError,
-                lxml.etree.XMLSchemaParseError,
-                lxml.etree.XIncludeError) as error:
+        except (etree.DocumentInvalid,
+                etree.XMLSyntaxError,
+                etree.XMLSchemaParseError,
+                etree.XIncludeError) as error:
             raise ParserException("While parsing '{}':"
                                   " {}".format(error.error_log.last_error.filename,
                                                error))
@@ -48,21 +75,32 @@ class Parser:
 
 
 class DeviceParser(Parser):
-    def __init__(self):
+    def __init__(self, validate=False):
         Parser.__init__(self,
-                        pkg.get_filename('modm_devices', 'resources/schema/device.xsd'))
+                        pkg.get_filename('modm_devices', 'resources/schema/device.xsd'),
+                        validate)
 
     def parse(self, filename):
-        rootnode = self.validate_and_parse_xml(filename, self.xsdfile)
+        # Binary device files are decoded directly and cannot be validated
+        if str(filename).endswith(binary.SUFFIX):
+            return binary.load(filename)
+        # Prefer the binary file of an XML file, if it was built from its content
+        if not self.validate and binary.is_current(filename):
+            try:
+                return binary.load(binary.filename_of(filename), filename)
+            except ParserException as error:
+                LOGGER.warning("Ignoring invalid binary device file of '%s': %s", filename, error)
+        rootnode = self.validate_and_parse_xml(filename, self.xsdfile, self.validate)
         return DeviceFile(filename, rootnode)
 
 
 class DriverParser(Parser):
-    def __init__(self):
+    def __init__(self, validate=False):
         Parser.__init__(self,
-                        xsdfile=pkg.get_filename('modm_devices', 'resources/schema/driver.xsd'))
+                        xsdfile=pkg.get_filename('modm_devices', 'resources/schema/driver.xsd'),
+                        validate=validate)
 
     def parse(self, filename):
-        rootnode = self.validate_and_parse_xml(filename, self.xsdfile)
+        rootnode = self.validate_and_parse_xml(filename, self.xsdfile, self.validate)
         return rootnode
 
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pin multiplexing solver on top of the gpio signal index of a device.
+
+Every requested signal is a `(driver, instance, name)` tuple, like
+`("usart", 2, "tx")`, and is assigned one pin that carries this signal, so
+that no pin is used twice. The pins are encoded as bits of an occupancy
+mask, and the assignment is found by backtracking over the signal with the
+fewest remaining pins first, see `solver.assign()`.
+
+The STM32F1 devices select the pins of a peripheral instance by remap
+groups, so all remapped signals of an instance are assigned together from
+the same group.
+"""
+
+import itertools
+
+from collections import defaultdict
+
+from .solver import assign, assign_all, signal_key
+
+
+def _problem(device, signals, reserved):
+    """
+    Encodes the candidate pins of every item as (bits, pins) tuples, where an
+    item is a single signal or the remapped signals of one instance.
+
+    Returns:
+        (items, candidates, used), with the tuple of signal positions of
+        every item.
+    """
+    bits = {}
+    def bit(port, pin):
+        return 1 << bits.setdefault((str(port).lower(), str(pin)), len(bits))
+
+    used = 0
+    for port, pin in reserved:
+        used |= bit(port, pin)
+
+    items, candidates = [], []
+    remapped = defaultdict(list)
+    for position, key in enumerate(signals):
+        pins = device.signals.get(key, [])
+        if any("remap" in p for p in pins):
+            remapped[key[:2]].append(position)
+        else:
+            items.append((position,))
+            candidates.append([(bit(p["port"], p["pin"]), (p,)) for p in pins])
+
+    for positions in remapped.values():
+        # The pins of every signal per remap group, the pins without remap
+        # group can be combined with every group
+        groups = defaultdict(lambda: [[] for _ in positions])
+        common = [[] for _ in positions]
+        for index, position in enumerate(positions):
+            for pin in device.signals[signals[position]]:
+                if "remap" in pin:
+                    groups[pin["remap"]][index].append(pin)
+                else:
+                    common[index].append(pin)
+        options = []
+        for group in groups.values():
+            for pins in itertools.product(*(g + c for g, c in zip(group, common))):
+                masks = [bit(p["port"], p["pin"]) for p in pins]
+                mask = sum(masks)
+                # Signals of the same instance cannot share a pin either
+                if len(set(masks)) == len(masks):
+                    options.append((mask, pins))
+        items.append(tuple(positions))
+        candidates.append(options)
+    return (items, candidates, used)
+
+
+def _result(signals, keys, items, assignment):
+    pins = {}
+    for positions, values in zip(items, assignment):
+        for position, pin in zip(positions, values):
+            pins[keys[position]] = pin
+    return {signal: pins[signal_key(signal)] for signal in signals}
+
+
+def solve(device, signals, reserved=None):
+    """
+    Finds a conflict-free pin for every requested signal of this device.
+
+    Arguments:
+        device: The Device.
+        signals: A list of (driver, instance, name) tuples, the instance is
+                 None for signals without instance.
+        reserved: A list of (port, pin) tuples that must not be used.
+
+    Returns:
+        A dict of every requested signal to its pin, a read-only dict of the
+        `port`, `pin` and signal attributes like `af` or `remap`, or None if
+        there is no conflict-free assignment.
+    """
+    keys = list(dict.fromkeys(signal_key(signal) for signal in signals))
+    items, candidates, used = _problem(device, keys, reserved or [])
+    assignment = assign(candidates, used)
+    if assignment is None:
+        return None
+    return _result(signals, keys, items, assignment)
+
+
+def solve_all(devices, signals, reserved=None, jobs=1):
+    """
+    Solves the same request for many devices, for example to select all
+    devices of a Database that can provide these signals.
+
+    The candidate pins are looked up in this process, and the assignments
+    are searched by a pool of `jobs` processes if `jobs` is larger than 1.
+
+    Returns:
+        A dict of the partnames of all feasible devices to their assignment,
+        see `solve()`.
+    """
+    keys = list(dict.fromkeys(signal_key(signal) for signal in signals))
+    problems = []
+    device_items = {}
+    for device in devices:
+        items, candidates, used = _problem(device, keys, reserved or [])
+        # Signals without any pin make the device infeasible right away
+        if all(candidates):
+            problems.append((device.partname, candidates, used))
+            device_items[device.partname] = items
+
+    results = assign_all(problems, jobs)
+    return {partname: _result(signals, keys, device_items[partname], assignment)
+            for partname, assignment in results if assignment is not None}
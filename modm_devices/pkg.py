@@ -9,11 +9,8 @@ fashion to pkgutil.get_data().
 
 import os
 import re
-import sys
-import pkgutil
-
-import urllib.request
-import urllib.parse
+import pathlib
+import importlib.util
 
 def naturalkey(key):
     """
@@ -31,22 +28,35 @@ def naturalkey(key):
 def get_filename(package, resource):
     """Rewrite of pkgutil.get_data() that return the file path.
     """
-    loader = pkgutil.get_loader(package)
-    if loader is None or not hasattr(loader, 'get_data'):
-        return None
-    mod = sys.modules.get(package) or loader.load_module(package)
-    if mod is None or not hasattr(mod, '__file__'):
+    # Locate the package without importing it
+    spec = importlib.util.find_spec(package)
+    if spec is None or spec.origin is None:
         return None
 
     # Modify the resource name to be compatible with the loader.get_data
     # signature - an os.path format "filename" starting with the dirname of
     # the package's __file__
     parts = resource.split('/')
-    parts.insert(0, os.path.dirname(mod.__file__))
+    parts.insert(0, os.path.dirname(spec.origin))
     resource_name = os.path.normpath(os.path.join(*parts))
 
     return resource_name
 
 CATALOGFILE = get_filename('modm_devices', 'resources/catalog.xml')
-os.environ['XML_CATALOG_FILES'] = \
-    urllib.parse.urljoin('file:', urllib.request.pathname2url(CATALOGFILE))
+
+def set_xml_catalog():
+    """
+    Points libxml2 to the catalog of this package. This must be called
+    before lxml is imported, otherwise it runs into an endless loop during
+    verification.
+    """
+    os.environ['XML_CATALOG_FILES'] = pathlib.Path(CATALOGFILE).absolute().as_uri()
+
+def import_etree():
+    """
+    Returns the lxml.etree module, which is imported after the catalog of
+    this package was set, see `set_xml_catalog()`.
+    """
+    set_xml_catalog()
+    import lxml.etree
+    return lxml.etree
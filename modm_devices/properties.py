@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Read-only containers for the device property tree.
+
+The property trees are cached and shared between devices, so they are
+returned as read-only dicts and lists. They compare, iterate and serialize
+like the builtin types, and `copy()` or `copy.deepcopy()` return a mutable
+deep copy made of builtin types.
+"""
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError("'{}' object is read-only, use copy() to get a mutable copy"
+                    .format(type(self).__name__))
+
+
+class FrozenDict(dict):
+    __slots__ = []
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def copy(self):
+        return thaw(self)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class FrozenList(list):
+    __slots__ = []
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = reverse = sort = clear = _readonly
+
+    def copy(self):
+        return thaw(self)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+def freeze(obj):
+    """
+    Returns a read-only deep copy of a tree of dicts and lists.
+    """
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return FrozenList(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj):
+    """
+    Returns a mutable deep copy of a tree of dicts and lists.
+    """
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [thaw(v) for v in obj]
+    return obj
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parametric search over all devices of a database.
+
+The numeric attributes of every device are extracted once into columns,
+and every distinct value of a column is mapped to the bitmask of devices
+with this value. A filter is then a binary search over the distinct values
+and a few integer operations over all devices at once.
+
+Available columns:
+
+- `flash`: the size of the `flash` memories in bytes.
+- `eeprom`: the size of the `eeprom` memories in bytes.
+- `ram`: the size of all writable memories in bytes, except the eeprom,
+  backup memories and aliases of other memories.
+- `pins`: the number of package pins, only known for devices with package
+  data in their `gpio` driver.
+"""
+
+import bisect
+
+from array import array
+
+from .exception import ParserException
+
+
+def _memory_size(device, names=None, exclude=()):
+    """
+    Sums the sizes of the memories with these names, or of all writable
+    memories that are not excluded.
+    """
+    core = device.get_driver("core")
+    size = 0
+    for memory in (core or {}).get("memory", []):
+        name = memory["name"]
+        if names is not None:
+            if name not in names:
+                continue
+        elif name in exclude or ("w" not in memory.get("access", "w") and "ram" not in name):
+            continue
+        size += int(memory["size"], 0)
+    return size
+
+
+def _pin_count(device):
+    gpio = device.get_driver("gpio")
+    packages = (gpio or {}).get("package")
+    if not packages:
+        return None
+    return len({pin["position"] for pin in packages[0].get("pin", [])})
+
+
+COLUMNS = {
+    "flash": lambda d: _memory_size(d, names={"flash"}),
+    "eeprom": lambda d: _memory_size(d, names={"eeprom"}),
+    "ram": lambda d: _memory_size(d, exclude={"flash", "extflash", "eeprom",
+                                              "backup", "bkpsram", "code_ram"}),
+    "pins": _pin_count,
+}
+
+
+class _Column:
+    """ _Column
+    The values of one attribute of all devices with a bitmask per value.
+    """
+    MISSING = -1
+
+    def __init__(self, values):
+        self.values = array('q', (self.MISSING if v is None else v for v in values))
+        masks = {}
+        for index, value in enumerate(values):
+            if value is not None:
+                masks[value] = masks.get(value, 0) | (1 << index)
+        self.keys = sorted(masks)
+        self.masks = [masks[k] for k in self.keys]
+        # cumulative masks of all values below and above a position
+        self.below = [0]
+        for mask in self.masks:
+            self.below.append(self.below[-1] | mask)
+        self.above = [0]
+        for mask in reversed(self.masks):
+            self.above.append(self.above[-1] | mask)
+        self.above.reverse()
+        self.known = self.below[-1]
+
+    def mask(self, op, value):
+        if op == "==":
+            pos = bisect.bisect_left(self.keys, value)
+            found = pos < len(self.keys) and self.keys[pos] == value
+            return self.masks[pos] if found else 0
+        if op == "!=":
+            return self.known & ~self.mask("==", value)
+        if op == "<":
+            return self.below[bisect.bisect_left(self.keys, value)]
+        if op == "<=":
+            return self.below[bisect.bisect_right(self.keys, value)]
+        if op == ">":
+            return self.above[bisect.bisect_right(self.keys, value)]
+        if op == ">=":
+            return self.above[bisect.bisect_left(self.keys, value)]
+        raise ParserException("Unknown operator '{}'!".format(op))
+
+
+class DeviceSearch:
+    """ DeviceSearch
+    Columnar index of the numeric attributes and drivers of all devices.
+
+    Example:
+        search = DeviceSearch(Database())
+        search.find(("flash", ">=", 512*1024), ("ram", ">=", 128*1024),
+                    ("pins", "<=", 64), drivers=["fdcan"])
+
+    Arguments:
+        devices: an iterable of Device, for example a Database.
+        columns: a dict of column name to a function returning the integer
+                 value of a device or None, defaults to `COLUMNS`.
+    """
+    def __init__(self, devices, columns=None):
+        devices = sorted(devices, key=lambda d: d.partname)
+        columns = COLUMNS if columns is None else columns
+        self.partnames = [d.partname for d in devices]
+        self.all = (1 << len(devices)) - 1
+
+        self.columns = {name: _Column([function(d) for d in devices])
+                        for name, function in columns.items()}
+        # driver `name` and `name:type` to bitmask of devices
+        self.drivers = {}
+        for index, device in enumerate(devices):
+            bit = 1 << index
+            for driver in device.properties["driver"]:
+                for key in (driver["name"], driver["name"] + ":" + driver["type"]):
+                    self.drivers[key] = self.drivers.get(key, 0) | bit
+
+    def values(self, column):
+        """
+        Returns the array of values of this column in the order of
+        `partnames`, with -1 for unknown values.
+        """
+        return self.columns[column].values
+
+    def driver_mask(self, name):
+        """
+        Returns the bitmask of devices with a driver matching the `name`,
+        `name:type` or `name:type-prefix*` pattern.
+        """
+        if name.endswith("*"):
+            mask = 0
+            for key, dmask in self.drivers.items():
+                if ":" in key and key.startswith(name[:-1]):
+                    mask |= dmask
+            return mask
+        if name.count(":") > 1:
+            raise ParserException("Invalid driver name '{}'. "
+                                  "The name must contain no or one ':' to "
+                                  "separate type and name.".format(name))
+        return self.drivers.get(name, 0)
+
+    def mask(self, *conditions, drivers=None):
+        """
+        Returns the bitmask of devices matching all `(column, operator, value)`
+        conditions and having all `drivers`.
+        """
+        mask = self.all
+        for column, op, value in conditions:
+            if column not in self.columns:
+                raise ParserException("Unknown column '{}'!".format(column))
+            mask &= self.columns[column].mask(op, value)
+        for name in (drivers or []):
+            mask &= self.driver_mask(name)
+        return mask
+
+    def partnames_of(self, mask):
+        names = []
+        while mask:
+            low = mask & -mask
+            names.append(self.partnames[low.bit_length() - 1])
+            mask ^= low
+        return names
+
+    def find(self, *conditions, drivers=None):
+        """
+        Returns the sorted partnames of all matching devices.
+        See `mask()` for the arguments.
+        """
+        return self.partnames_of(self.mask(*conditions, drivers=drivers))
+
+    def count(self, *conditions, drivers=None):
+        return bin(self.mask(*conditions, drivers=drivers)).count("1")
+
+    def __len__(self):
+        return len(self.partnames)
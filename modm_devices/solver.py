@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backtracking solver for exclusive resources like pins or DMA channels.
+
+Every resource is a bit of an occupancy mask, and every item that needs a
+resource has a list of candidates that each occupy some of these bits.
+"""
+
+import multiprocessing
+
+from .exception import ParserException
+
+
+def signal_key(signal):
+    """
+    Normalizes a requested (driver, instance, name) signal to strings, the
+    instance and name may be None.
+    """
+    if len(signal) != 3:
+        raise ParserException("Invalid signal '{}'. A signal must be a "
+                              "(driver, instance, name) tuple.".format(signal))
+    driver, instance, name = signal
+    return (driver, None if instance is None else str(instance), name)
+
+
+def assign(candidates, used=0):
+    """
+    Chooses one candidate for every item, so that no resource is used twice.
+
+    The search continues with the item with the fewest free candidates, and
+    stops as soon as there are fewer free resources than remaining items.
+
+    Arguments:
+        candidates: A list of the candidates of every item, as a list of
+                    (mask, value) tuples. Every mask must have a bit set.
+        used: The mask of already used resources.
+
+    Returns:
+        The list of the chosen values or None if there is no assignment.
+    """
+    assignment = [None] * len(candidates)
+
+    def search(used, remaining):
+        if not remaining:
+            return True
+        free_bits = 0
+        best, options = None, None
+        for index in remaining:
+            free = [c for c in candidates[index] if not used & c[0]]
+            if not free:
+                return False
+            for mask, _ in free:
+                free_bits |= mask
+            if options is None or len(free) < len(options):
+                best, options = index, free
+        if bin(free_bits).count("1") < len(remaining):
+            return False
+        remaining = [r for r in remaining if r != best]
+        for mask, value in options:
+            assignment[best] = value
+            if search(used | mask, remaining):
+                return True
+        assignment[best] = None
+        return False
+
+    if search(used, list(range(len(candidates)))):
+        return assignment
+    return None
+
+
+def _assign_problem(problem):
+    key, candidates, used = problem
+    return (key, assign(candidates, used))
+
+
+def assign_all(problems, jobs=1):
+    """
+    Solves many (key, candidates, used) problems, in a pool of `jobs`
+    processes if `jobs` is larger than 1. The candidates must be picklable.
+
+    Returns:
+        A list of (key, assignment) tuples in the order of the problems.
+    """
+    problems = list(problems)
+    if jobs > 1 and len(problems) > 1:
+        with multiprocessing.Pool(jobs) as pool:
+            chunksize = max(1, len(problems) // (4 * jobs))
+            return pool.map(_assign_problem, problems, chunksize=chunksize)
+    return [_assign_problem(problem) for problem in problems]
@@ -0,0 +1,47 @@
+import unittest
+
+from modm_devices.device_file import DeviceFile
+
+from .helpers import device_file
+
+DRIVERS = """
+    <driver name="core" type="cortex-m4f">
+      <memory device-name="01" name="sram1" size="65536"/>
+      <memory device-name="11" name="sram1" size="131072"/>
+    </driver>
+    <driver device-pin="r" name="sdio" type="stm32">
+      <!-- comment -->
+      <instance device-name="11" value="1"/>
+    </driver>"""
+
+class ApplicabilityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.device_file = device_file(DRIVERS)
+        self.applicability = self.device_file.get_applicability()
+
+    def test_rows(self):
+        applicability = self.applicability
+        self.assertIs(self.device_file.get_applicability(), applicability)
+        self.assertEqual(applicability.partnames,
+                         ["stm32f401c", "stm32f401r", "stm32f411c", "stm32f411r"])
+        sdio = self.device_file.rootnode.find("device/driver[@name='sdio']")
+        instance = sdio.find("instance")
+        self.assertEqual(applicability.devices(sdio), ["stm32f401r", "stm32f411r"])
+        # The selectors of the ancestors apply too
+        self.assertEqual(applicability.devices(instance), ["stm32f411r"])
+        self.assertEqual(applicability.mask(instance), 0b1000)
+        self.assertIn(sdio, applicability.column("stm32f401r"))
+        self.assertNotIn(instance, applicability.column("stm32f401r"))
+
+    def test_columns(self):
+        applicability = self.applicability
+        self.assertEqual(len(applicability.nodes), 7)
+        self.assertEqual(len(applicability.column("stm32f401c")), 4)
+        self.assertEqual([n.get("size") for n in applicability.column("stm32f411r") if n.tag == "memory"],
+                         ["131072"])
+        for node, mask in zip(applicability.nodes, applicability.rows):
+            ancestors = [node] + list(node.iterancestors())
+            expected = sum(1 << i for i, d in enumerate(self.device_file.get_devices())
+                           if all(DeviceFile.is_valid(n, d._identifier) for n in ancestors))
+            self.assertEqual(mask, expected)
@@ -0,0 +1,159 @@
+import glob
+import os
+import tempfile
+import unittest
+
+import lxml.etree
+
+from modm_devices import binary
+from modm_devices.device_file import DeviceFile
+from modm_devices.exception import ParserException
+from modm_devices.parser import DeviceParser, Parser
+
+from .helpers import DEVICES_PATH, GPIO_DRIVER, device_xml, devices_of
+
+DEVICE_FILE = device_xml("""
+    <invalid-device>stm32f401c</invalid-device>
+    <driver name="spi" type="stm32">
+      <instance value="1"/>
+      <instance device-name="11" device-pin="r" value="4"/>
+    </driver>""" + GPIO_DRIVER)
+
+def selector_tree(node):
+    return (node.tag, node.selectors, node.attrib, node.keys,
+            [selector_tree(child) for child in node.children])
+
+def element_tree(element):
+    # Comments and whitespace are not stored
+    text = element.text if element.text is not None and element.text.strip() else None
+    return (element.tag, dict(element.attrib), text,
+            [element_tree(child) for child in element if isinstance(child.tag, str)])
+
+class BinaryTest(unittest.TestCase):
+
+    def setUp(self):
+        rootnode = lxml.etree.fromstring(DEVICE_FILE.encode("utf-8"))
+        self.device_file = DeviceFile("test.xml", rootnode)
+        self.data = binary.dumps(rootnode)
+
+    def test_round_trip(self):
+        binary_file = binary.loads(self.data, "test.xml")
+        devices = self.device_file.get_devices()
+        self.assertEqual([d.partname for d in binary_file.get_devices()],
+                         [d.partname for d in devices])
+        for device in devices:
+            self.assertEqual(binary_file.get_properties(device._identifier), device.properties)
+        self.assertEqual(binary.dumps(binary_file.rootnode.to_etree()), self.data)
+
+    def test_round_trip_devices(self):
+        filenames = glob.glob(os.path.join(DEVICES_PATH, "**", "*.xml"), recursive=True)
+        self.assertTrue(filenames)
+        for filename in filenames:
+            rootnode = Parser.validate_and_parse_xml(filename, None)
+            device_file = DeviceFile(filename, rootnode)
+            data = binary.dumps(rootnode)
+            binary_file = binary.loads(data, filename)
+
+            devices = device_file.get_devices()
+            self.assertEqual([d.partname for d in binary_file.get_devices()],
+                             [d.partname for d in devices], filename)
+            self.assertEqual(selector_tree(binary_file._get_device_node()),
+                             selector_tree(device_file._get_device_node()), filename)
+            for device in devices:
+                self.assertEqual(binary_file.get_properties(device._identifier),
+                                 device.properties, device.partname)
+            self.assertEqual(element_tree(binary_file.rootnode), element_tree(rootnode), filename)
+
+    def test_query(self):
+        binary_file = binary.loads(self.data, "test.xml")
+        device = devices_of(binary_file)["stm32f411r"]
+        self.assertEqual(device.query("driver/instance/@value"), ["1", "4"])
+        self.assertEqual(device.get_signal_pins("usart", 2, "tx"),
+                         [{"port": "a", "pin": "2", "af": "7"}, {"port": "d", "pin": "5", "af": "7"}])
+        self.assertEqual(devices_of(binary_file)["stm32f411c"].query("driver/gpio/@port"), ["a", "a", "b"])
+
+    def test_parser(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "test" + binary.SUFFIX)
+            binary.dump(self.device_file.rootnode, filename)
+            device_file = DeviceParser().parse(filename)
+            self.assertEqual(len(device_file.get_devices()), 3)
+
+    def test_parser_prefers_binary(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "test.xml")
+            with open(filename, "w") as xml_file:
+                xml_file.write(DEVICE_FILE)
+            binary_filename = binary.filename_of(filename)
+            binary.dump(self.device_file.rootnode, binary_filename, filename)
+            device_file = DeviceParser().parse(filename)
+            self.assertIsInstance(device_file, binary.BinaryDeviceFile)
+            self.assertEqual(device_file.filename, filename)
+            # Validation always parses the XML file
+            self.assertNotIsInstance(DeviceParser(validate=True).parse(filename),
+                                     binary.BinaryDeviceFile)
+
+            # The file times do not matter, only the content of the XML file
+            stat = os.stat(filename)
+            os.utime(binary_filename, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+            self.assertIsInstance(DeviceParser().parse(filename), binary.BinaryDeviceFile)
+            with open(filename, "w") as xml_file:
+                xml_file.write(DEVICE_FILE.replace('value="4"', 'value="5"'))
+            os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**10))
+            device_file = DeviceParser().parse(filename)
+            self.assertNotIsInstance(device_file, binary.BinaryDeviceFile)
+            self.assertEqual(devices_of(device_file)["stm32f411r"].get_driver("spi")["instance"], ["1", "5"])
+            with open(filename, "w") as xml_file:
+                xml_file.write(DEVICE_FILE.replace('value="4"', 'value="X"'))
+            self.assertNotIsInstance(DeviceParser().parse(filename), binary.BinaryDeviceFile)
+
+            # A binary file without source is never used for an XML file
+            with open(filename, "w") as xml_file:
+                xml_file.write(DEVICE_FILE)
+            binary.dump(self.device_file.rootnode, binary_filename)
+            self.assertNotIsInstance(DeviceParser().parse(filename), binary.BinaryDeviceFile)
+
+            # An invalid binary file falls back to the XML file
+            with open(binary_filename, "wb") as binary_file:
+                binary_file.write(binary.dumps(self.device_file.rootnode, DEVICE_FILE.encode("utf-8"))[:-4])
+            with self.assertLogs("modm_devices.parser", "WARNING"):
+                device_file = DeviceParser().parse(filename)
+            self.assertEqual(len(device_file.get_devices()), 3)
+
+    def test_invalid(self):
+        header = len(binary.MAGIC) + binary._SOURCE.size + binary._HEADER.size
+        nstrings, size, _, _, _ = binary._HEADER.unpack_from(self.data, header - binary._HEADER.size)
+        strings = header + 4 * nstrings
+        nodes = strings + size
+        def patch(offset, value):
+            return self.data[:offset] + value + self.data[offset + len(value):]
+        def node(index, field, value):
+            return patch(nodes + 20 * index + 4 * field, value.to_bytes(4, "little"))
+
+        corrupt = [
+            b"",
+            binary.MAGIC,
+            b"<?xml version='1.0'?>",
+            self.data[:-4],
+            self.data + b"\0",
+            # invalid UTF-8 in the string data
+            patch(strings, b"\xff"),
+            # string lengths that do not add up to the string data
+            patch(header, (2).to_bytes(4, "little")),
+            # no nodes
+            binary.MAGIC + bytes(binary._SOURCE.size) + binary._HEADER.pack(0, 0, 0, 0, 0),
+            # a tag, text and parent out of range
+            node(0, 0, nstrings),
+            node(1, 1, nstrings + 1),
+            node(1, 2, 3),
+            # a second root node
+            node(1, 2, 0),
+            # attribute counts that do not add up
+            node(0, 3, 2),
+            node(0, 4, 1),
+            # a root without device node
+            binary.dumps(lxml.etree.fromstring(b"<modm><other/></modm>")),
+        ]
+        for index, data in enumerate(corrupt):
+            with self.assertRaises(ParserException, msg=index):
+                binary.loads(data)
@@ -0,0 +1,91 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from modm_devices.database import Database, default_cache_path
+from modm_devices.parser import DeviceParser
+from modm_devices.exception import ParserException
+
+from .helpers import DEVICES_PATH
+
+class DatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = os.path.join(self.tmpdir, "cache", "database.pickle")
+        self.filenames = []
+        for name in ["rp/rp2040.xml", "nrf/nrf52840.xml"]:
+            filename = os.path.join(self.tmpdir, os.path.basename(name))
+            shutil.copy(os.path.join(DEVICES_PATH, name), filename)
+            self.filenames.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_load_from_cache(self):
+        database = Database(self.filenames, cache=self.cache)
+        self.assertTrue(os.path.exists(self.cache))
+        self.assertEqual(sorted(database.devices), ["nrf52840-xxaa", "rp2040"])
+        self.assertIn("rp2040", database)
+        self.assertIsNone(database.get("rp2041"))
+
+        cached = Database(self.filenames, cache=self.cache)
+        self.assertEqual(len(cached), 2)
+        for device in cached:
+            self.assertIsNone(device.device_file._rootnode)
+            self.assertEqual(device.properties, database[device.partname].properties)
+        # the device file is still parsed on demand
+        self.assertEqual(cached["rp2040"].device_file.rootnode.tag, "modm")
+
+    def test_reparse_changed_files(self):
+        Database(self.filenames, cache=self.cache)
+        os.utime(self.filenames[0], ns=(0, 0))
+        database = Database(self.filenames, cache=self.cache)
+        self.assertIsNotNone(database["rp2040"].device_file._rootnode)
+        self.assertIsNone(database["nrf52840-xxaa"].device_file._rootnode)
+
+    def test_prune_removed_files(self):
+        Database(self.filenames, cache=self.cache)
+        renamed = os.path.join(self.tmpdir, "rp2040-renamed.xml")
+        os.rename(self.filenames[0], renamed)
+        database = Database([renamed, self.filenames[1]], cache=self.cache)
+        self.assertEqual(sorted(database.devices), ["nrf52840-xxaa", "rp2040"])
+        with open(self.cache, "rb") as cache_file:
+            files = pickle.load(cache_file)["files"]
+        self.assertEqual(sorted(files), sorted(os.path.realpath(f) for f in [renamed, self.filenames[1]]))
+
+        os.remove(renamed)
+        Database(self.filenames[1:], cache=self.cache)
+        with open(self.cache, "rb") as cache_file:
+            files = pickle.load(cache_file)["files"]
+        self.assertEqual(list(files), [os.path.realpath(self.filenames[1])])
+
+    def test_default_cache_path(self):
+        self.assertEqual(os.path.basename(default_cache_path()), "database.pickle")
+        self.assertNotEqual(default_cache_path(self.filenames), default_cache_path(self.filenames[:1]))
+
+    def test_without_cache(self):
+        database = Database(self.filenames[:1], cache=None)
+        self.assertFalse(os.path.exists(self.cache))
+        device = DeviceParser().parse(self.filenames[0]).get_devices()[0]
+        self.assertEqual(database["rp2040"].properties, device.properties)
+
+    def test_driver_index(self):
+        Database(self.filenames, cache=self.cache)
+        database = Database(self.filenames, cache=self.cache)
+        drivers = database.drivers
+        # the index is restored without unpickling the properties
+        self.assertIsNotNone(database["rp2040"].device_file._pickled_properties)
+
+        self.assertEqual(drivers.find("spi"), ["nrf52840-xxaa", "rp2040"])
+        self.assertEqual(drivers.find("spi:rp20"), ["rp2040"])
+        self.assertEqual(drivers.find("spi:nrf*", 1), ["nrf52840-xxaa"])
+        self.assertEqual(drivers.find("spi", "2"), ["nrf52840-xxaa"])
+        self.assertEqual(drivers.find("spi", 3), [])
+        self.assertEqual(drivers.find("usart"), [])
+        self.assertEqual(drivers.types("uart"), ["nrf52", "rp20"])
+        self.assertEqual(drivers.instances("egu"), ["0", "1", "2", "3", "4", "5"])
+        self.assertIn("pio", drivers)
+        self.assertRaises(ParserException, lambda: drivers.find("spi:rp20:0"))
@@ -0,0 +1,134 @@
+import copy
+import pickle
+import unittest
+
+from modm_devices.exception import ParserException
+
+from .helpers import GPIO_DRIVER, device_file, devices_of, parse_device_file
+
+DRIVERS = """
+    <invalid-device>stm32f401c</invalid-device>
+    <driver name="core" type="cortex-m4f">
+      <memory device-name="01" name="sram1" size="65536"/>
+      <memory device-name="11" name="sram1" size="131072"/>
+    </driver>
+    <driver name="spi" type="stm32">
+      <instance value="1"/>
+      <instance device-name="11" device-pin="r" value="4"/>
+    </driver>
+    <driver device-pin="r" name="sdio" type="stm32"/>"""
+
+class DeviceFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.device_file = device_file(DRIVERS, platform="stm32", family="f4",
+                                       name="01|11", pin="c|r", variant="")
+        self.devices = devices_of(self.device_file)
+
+    def test_get_devices(self):
+        self.assertEqual(sorted(self.devices), ["stm32f401r", "stm32f411c", "stm32f411r"])
+
+    def test_iter_devices(self):
+        self.assertEqual(sorted(d.partname for d in self.device_file.iter_devices()),
+                         sorted(self.devices))
+
+    def test_get_properties(self):
+        properties = self.devices["stm32f411r"].properties
+        self.assertEqual(properties, {"driver": [
+            {"name": "core", "type": "cortex-m4f", "memory": [
+                {"name": "sram1", "size": "131072"}]},
+            {"name": "spi", "type": "stm32", "instance": ["1", "4"]},
+            {"name": "sdio", "type": "stm32"}]})
+
+        properties = self.devices["stm32f401r"].properties
+        self.assertEqual(properties["driver"][0]["memory"], [{"name": "sram1", "size": "65536"}])
+        self.assertEqual(properties["driver"][1]["instance"], ["1"])
+
+        properties = self.devices["stm32f411c"].properties
+        self.assertEqual([d["name"] for d in properties["driver"]], ["core", "spi"])
+
+    def test_properties_are_cached(self):
+        identifier = self.devices["stm32f411r"].identifier
+        properties = self.device_file.get_properties(identifier)
+        self.assertIs(self.device_file.get_properties(identifier.copy()), properties)
+        # subtrees without selectors are shared between devices
+        other = self.device_file.get_properties(self.devices["stm32f411c"].identifier)
+        self.assertIs(other["driver"][0], properties["driver"][0])
+
+    def test_properties_are_read_only(self):
+        properties = self.devices["stm32f411r"].properties
+        self.assertRaises(TypeError, lambda: properties.update(driver=[]))
+        self.assertRaises(TypeError, lambda: properties["driver"].append({}))
+        self.assertRaises(TypeError, lambda: properties["driver"][0].pop("name"))
+
+        mutable = properties.copy()
+        mutable["driver"][0]["name"] = "cpu"
+        mutable["driver"].append({})
+        self.assertEqual(type(mutable), dict)
+        self.assertEqual(type(mutable["driver"]), list)
+        self.assertEqual(properties["driver"][0]["name"], "core")
+        self.assertEqual(copy.deepcopy(properties), properties)
+        self.assertEqual(type(copy.deepcopy(properties)), dict)
+        self.assertEqual(pickle.loads(pickle.dumps(properties)), properties)
+
+    def test_get_driver(self):
+        device = self.devices["stm32f411r"]
+        self.assertEqual(device.get_driver("spi")["instance"], ["1", "4"])
+        self.assertIs(device.get_driver("spi:stm32"), device.get_driver("spi"))
+        self.assertEqual(len(device.get_all_drivers("spi:stm*")), 1)
+        self.assertIsNone(device.get_driver("spi:stm"))
+        self.assertTrue(device.has_driver("sdio"))
+        self.assertTrue(device.has_driver("core", ["cortex-m0", "cortex-m4*"]))
+        self.assertFalse(device.has_driver("core", ["cortex-m0"]))
+        self.assertFalse(self.devices["stm32f411c"].has_driver("sdio"))
+
+    def test_get_driver_is_lazy(self):
+        device = self.devices["stm32f411r"]
+        spi = device.get_driver("spi")
+        self.assertIsNone(device._properties)
+        self.assertIsNone(device.get_driver("adc"))
+        # The drivers are shared with the property tree
+        self.assertIs(device.properties["driver"][1], spi)
+        self.assertEqual(device.get_all_drivers("core"), [device.properties["driver"][0]])
+        self.assertEqual(device.get_all_drivers("spi:stm32"), [spi])
+        self.assertIn(("spi", "stm32"), device._drivers)
+
+    def test_signals(self):
+        devices = devices_of(device_file(GPIO_DRIVER))
+        device = devices["stm32f411r"]
+        self.assertEqual(device.get_signal_pins("usart", 2, "tx"),
+                         [{"port": "a", "pin": "2", "af": "7"}, {"port": "d", "pin": "5", "af": "7"}])
+        self.assertEqual(device.get_signal_pins("adc", "1", "in2"), [{"port": "a", "pin": "2"}])
+        self.assertEqual(device.get_signal_pins(None, None, "mco"), [{"port": "b", "pin": "0", "af": "0"}])
+        self.assertEqual(device.get_signal_pins("usart", 1, "tx"), [])
+        self.assertEqual(devices["stm32f401c"].get_signal_pins("usart", 2, "tx"),
+                         [{"port": "a", "pin": "2", "af": "7"}])
+        # devices with the same pins share the index
+        self.assertIs(devices["stm32f401r"].signals, device.signals)
+        self.assertIsNot(devices["stm32f401c"].signals, device.signals)
+        self.assertEqual(self.devices["stm32f411r"].signals, {})
+
+    def test_remap_signals(self):
+        device = devices_of(parse_device_file("stm32", "stm32f1-03-8_b.xml"))["stm32f103rbt6"]
+        self.assertEqual(device.get_signal_pins("usart", 1, "tx"),
+                         [{"port": "a", "pin": "9", "remap": "0"}, {"port": "b", "pin": "6", "remap": "1"}])
+        self.assertEqual(device.get_signal_pins("usart", 1, "ck"), [{"port": "a", "pin": "8"}])
+        # The remap group of the vt6 package only is filtered out
+        self.assertEqual(len(device.get_signal_pins("usart", 2, "tx")), 1)
+
+    def test_query(self):
+        devices = devices_of(device_file(GPIO_DRIVER))
+        path = "driver[@name='gpio']/gpio/signal[@driver='usart'][@instance='2'][@name='tx']"
+        self.assertEqual(devices["stm32f411r"].query(path),
+                         [{"af": "7", "driver": "usart", "instance": "2", "name": "tx"}] * 2)
+        # The gpio of port d is filtered out by its selector
+        self.assertEqual(len(devices["stm32f411c"].query(path)), 1)
+        self.assertEqual(devices["stm32f411c"].query("driver/gpio/@port"), ["a", "a", "b"])
+        self.assertEqual(devices["stm32f411r"].query("driver/gpio[@port='d']"), [{"port": "d", "pin": "5"}])
+        self.assertEqual(devices["stm32f411r"].query("count(driver/gpio)"), 4.0)
+        self.assertEqual(self.devices["stm32f411r"].query("driver/instance/@value"), ["1", "4"])
+        self.assertEqual(self.devices["stm32f401r"].query("driver/instance/@value"), ["1"])
+        self.assertEqual(self.devices["stm32f411c"].query("driver[@name='sdio']"), [])
+        self.assertIsNone(self.devices["stm32f411c"]._properties)
+        with self.assertRaises(ParserException):
+            self.devices["stm32f411c"].query("driver[")
@@ -0,0 +1,33 @@
+import os
+import unittest
+
+import modm_devices
+from modm_devices.parser import DeviceParser
+from modm_devices.device_index import DeviceIndex
+
+from .helpers import DEVICES_PATH
+
+class DeviceIndexTest(unittest.TestCase):
+
+    def test_build_and_lookup(self):
+        filename = os.path.join(DEVICES_PATH, "rp", "rp2040.xml")
+        device_file = DeviceParser().parse(filename)
+        index = DeviceIndex.from_device_files([device_file], DEVICES_PATH)
+
+        self.assertEqual(len(index), 1)
+        self.assertIn("rp2040", index)
+        self.assertEqual(os.path.realpath(index.filename("rp2040")),
+                         os.path.realpath(filename))
+        self.assertEqual(index.identifier("rp2040").string, "rp2040")
+        self.assertIsNone(index.identifier("rp2041"))
+
+        device = index.lookup("rp2040")
+        self.assertEqual(device.partname, "rp2040")
+        self.assertEqual(device.properties, device_file.get_devices()[0].properties)
+        self.assertIsNone(index.lookup("rp2041"))
+
+    def test_shipped_index(self):
+        device = modm_devices.lookup("stm32f407vgt6")
+        self.assertEqual(device.partname, "stm32f407vgt6")
+        self.assertTrue(device.has_driver("usart"))
+        self.assertIsNone(modm_devices.lookup("stm32f407vgt9"))
@@ -1,8 +1,9 @@
 
+import pickle
 import unittest
 
 from modm_devices.exception import DeviceIdentifierException
-from modm_devices.device_identifier import DeviceIdentifier, MultiDeviceIdentifier
+from modm_devices.device_identifier import DeviceIdentifier, MultiDeviceIdentifier, NamingSchema
 
 class DeviceIdentifierTest(unittest.TestCase):
 
@@ -90,6 +91,62 @@ class DeviceIdentifierTest(unittest.TestCase):
         self.assertEqual(ident2.naming_schema, "{platform}{family}")
         self.assertEqual(ident.naming_schema, "{platform}")
 
+        # copies share their properties until they are modified
+        ident3 = ident.copy()
+        self.assertIs(ident3._properties, ident._properties)
+        ident.set("platform", "sam")
+        self.assertEqual(ident3.platform, "stm32")
+        self.assertEqual(ident3.string, "stm32")
+        self.assertEqual(ident.string, "sam")
+        ident3.naming_schema = "{platform}!"
+        self.assertEqual(ident3.string, "stm32!")
+
+
+    def test_pickle(self):
+        ident = DeviceIdentifier("{platform}{family}")
+        ident.set("platform", "stm32")
+        ident.set("family", "f1")
+
+        ident2 = pickle.loads(pickle.dumps(ident))
+        self.assertEqual(ident2, ident)
+        self.assertEqual(ident2.string, "stm32f1")
+        self.assertEqual(ident2.naming_schema, "{platform}{family}")
+        self.assertRaises(AttributeError,
+                          lambda: ident2._whatevs)
+
+
+
+class NamingSchemaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.values = {"platform": ["stm32"], "family": ["f0", "f4"],
+                       "name": ["01", "11"], "pin": ["c", "r"], "variant": ["", "x"]}
+        self.schema = NamingSchema("{platform}{family}{name}{pin}{variant}", self.values)
+
+    def test_format(self):
+        self.assertEqual(self.schema.keys, ["platform", "family", "name", "pin", "variant"])
+        self.assertEqual(self.schema.format({"platform": "stm32", "family": "f4"}), "stm32f4")
+        # schemas with format specs are formatted by the string.Formatter
+        self.assertEqual(NamingSchema("{a:>3}%{b}").format({"a": "1"}), "  1%")
+
+    def test_parse(self):
+        ident = self.schema.parse("stm32f411rx")
+        self.assertEqual(ident.string, "stm32f411rx")
+        self.assertEqual(list(ident.keys()), list(self.values.keys()))
+        self.assertEqual(ident.variant, "x")
+        self.assertEqual(self.schema.parse("stm32f411r")["variant"], "")
+        self.assertIsNone(self.schema.parse("stm32f711r"))
+
+        idents = self.schema.parse_all(["stm32f001c", "stm32f412c", "stm32f411c"])
+        self.assertEqual([i and i.string for i in idents], ["stm32f001c", None, "stm32f411c"])
+
+    def test_parse_extra_keys(self):
+        schema = NamingSchema("at{name}", {"platform": ["avr"], "name": ["tiny13"]})
+        self.assertEqual(schema.parse("attiny13").platform, "avr")
+
+        schema = NamingSchema("at{name}", {"platform": ["avr", "sam"], "name": ["tiny13"]})
+        self.assertFalse(schema.is_parsable)
+        self.assertRaises(DeviceIdentifierException, lambda: schema.parse("attiny13"))
 
 
 class MultiDeviceIdentifierTest(unittest.TestCase):
@@ -111,3 +168,90 @@ class MultiDeviceIdentifierTest(unittest.TestCase):
 
         self.ident.append(DeviceIdentifier("{one}{two}"))
         self.assertEqual(self.ident.naming_schema, "{one}{one}{two}")
+
+    def test_minimal_subtract_set(self):
+        complete = MultiDeviceIdentifier.from_product(
+                {"name": ["01", "11"], "pin": ["c", "r"]}, "{name}{pin}")
+        complete = MultiDeviceIdentifier.from_list(complete.ids)
+
+        ids = complete.filter(lambda did: did.name == "11")
+        diffs = ids.minimal_subtract_set(complete, complete)
+        self.assertEqual([d.string for d in diffs], ["11"])
+        self.assertEqual(diffs[0].keys(), ["name"])
+
+        ids = complete.filter(lambda did: did.string in ["01c", "11r"])
+        diffs = ids.minimal_subtract_set(complete, complete)
+        self.assertEqual([d.string for d in diffs], ["01c", "11r"])
+
+        diffs = complete.minimal_subtract_set(complete, complete)
+        self.assertEqual([d.string for d in diffs], [""])
+
+        diffs = complete.filter(lambda did: False).minimal_subtract_set(complete, complete)
+        self.assertEqual([d.string for d in diffs], [""])
+        self.assertEqual(len(diffs[0]), 0)
+
+    def test_set_operations(self):
+        complete = MultiDeviceIdentifier.from_product(
+                {"name": ["01", "11"], "pin": ["c", "r"]}, "{name}{pin}")
+        ids = complete.filter(lambda did: did.pin == "c")
+        self.assertEqual([d.string for d in ids], ["01c", "11c"])
+        self.assertIn(ids, complete)
+        self.assertNotIn(complete, ids)
+
+        other = complete.filter(lambda did: did.name == "11")
+        self.assertEqual([d.string for d in ids.intersection(other)], ["11c"])
+
+        union = ids.copy()
+        union.extend(other)
+        self.assertEqual(len(union), 3)
+        self.assertEqual(len(ids), 2)
+        union.remove(complete[0])
+        self.assertEqual([d.string for d in union], ["11c", "11r"])
+        self.assertEqual(union, other)
+        self.assertEqual(hash(union), hash(other))
+
+        # modifying an identifier after adding it does not change the set
+        did = DeviceIdentifier("{name}")
+        did.set("name", "01")
+        ids = MultiDeviceIdentifier([did])
+        did.set("name", "11")
+        self.assertEqual(ids.string, "01")
+
+        restored = pickle.loads(pickle.dumps(complete))
+        self.assertEqual(restored, complete)
+
+    def test_attributes(self):
+        complete = MultiDeviceIdentifier.from_product(
+                {"name": ["11", "3", "01"], "pin": ["c", "r"]}, "{name}{pin}")
+        ids = complete.filter(lambda did: did.pin == "c")
+        self.assertEqual(ids.keys(), ["name", "pin"])
+        self.assertEqual(ids.getAttribute("name"), ["01", "3", "11"])
+        self.assertEqual(ids.getAttribute("pin"), ["c"])
+        self.assertEqual(ids.getAttribute("@string"), ["01c", "11c", "3c"])
+        self.assertEqual(ids.getAttribute("size"), [])
+
+        # the cached values are neither shared nor stale
+        ids.getAttribute("pin").append("x")
+        copy = ids.copy()
+        ids.append(complete[1])
+        self.assertEqual(ids.getAttribute("pin"), ["c", "r"])
+        self.assertEqual(copy.getAttribute("pin"), ["c"])
+        did = DeviceIdentifier("{name}{pin}{size}")
+        did.set("size", "8")
+        ids.append(did)
+        self.assertEqual(ids.keys(), ["name", "pin", "size"])
+        self.assertEqual(dict(ids.items())["size"], ["8"])
+
+    def test_membership(self):
+        complete = MultiDeviceIdentifier.from_product(
+                {"name": ["01", "11"], "pin": ["c", "r"]}, "{name}{pin}")
+        ids = complete.filter(lambda did: did.pin == "c")
+        self.assertEqual([did in ids for did in complete.product()], [True, False, True, False])
+        self.assertNotIn(DeviceIdentifier("{unknown}"), ids)
+
+        # the cached hash follows modifications
+        other = ids.copy()
+        self.assertEqual(hash(other), hash(ids))
+        other.append(complete[1])
+        self.assertNotEqual(other, ids)
+        self.assertEqual(hash(other), hash(complete.filter(lambda did: did.string != "11r")))
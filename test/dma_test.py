@@ -0,0 +1,73 @@
+import unittest
+
+from modm_devices import dma
+
+from .helpers import device_file, devices_of
+
+DRIVERS = """
+    <driver device-name="01" name="dma" type="stm32-stream-channel">
+      <instance value="1"/>
+      <streams instance="1">
+        <stream position="0">
+          <channel position="3">
+            <signal driver="spi" instance="1" name="rx"/>
+          </channel>
+        </stream>
+        <stream position="6">
+          <channel position="3">
+            <signal driver="spi" instance="1" name="rx"/>
+          </channel>
+          <channel position="4">
+            <signal driver="usart" instance="2" name="tx"/>
+          </channel>
+        </stream>
+      </streams>
+    </driver>
+    <driver device-name="11" name="dma" type="stm32-mux">
+      <instance value="1"/>
+      <requests>
+        <request position="5">
+          <signal driver="adc" instance="1"/>
+        </request>
+        <request position="16">
+          <signal driver="spi" instance="1" name="rx"/>
+        </request>
+        <request position="53">
+          <signal driver="usart" instance="2" name="tx"/>
+        </request>
+      </requests>
+      <mux-channels>
+        <mux-channel position="0" dma-instance="1" dma-channel="1"/>
+        <mux-channel position="1" dma-instance="1" dma-channel="2"/>
+      </mux-channels>
+    </driver>"""
+
+class DmaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.devices = devices_of(device_file(DRIVERS, platform="stm32", family="f4", name="01|11"))
+
+    def test_solve_streams(self):
+        device = self.devices["stm32f401"]
+        self.assertEqual(dma.solve(device, [("usart", 2, "tx"), ("spi", 1, "rx")]), {
+            ("usart", 2, "tx"): {"instance": "1", "stream": "6", "channel": "4"},
+            ("spi", 1, "rx"): {"instance": "1", "stream": "0", "channel": "3"}})
+        self.assertIsNone(dma.solve(device, [("adc", 1, None)]))
+        # The same signal in different spellings is allocated once
+        allocation = dma.solve(device, [("usart", 2, "tx"), ("usart", "2", "tx"), ("spi", 1, "rx")])
+        self.assertEqual(allocation[("usart", "2", "tx")], allocation[("usart", 2, "tx")])
+
+    def test_solve_mux(self):
+        device = self.devices["stm32f411"]
+        self.assertEqual(dma.solve(device, [("adc", "1", None), ("usart", 2, "tx")]), {
+            ("adc", "1", None): {"mux-channel": "0", "request": "5", "instance": "1", "channel": "1"},
+            ("usart", 2, "tx"): {"mux-channel": "1", "request": "53", "instance": "1", "channel": "2"}})
+        # there are only two DMAMUX channels
+        self.assertIsNone(dma.solve(device, [("adc", 1, None), ("usart", 2, "tx"), ("spi", 1, "rx")]))
+
+    def test_solve_all(self):
+        signals = [("usart", 2, "tx"), ("spi", 1, "rx")]
+        results = dma.solve_all(self.devices.values(), signals)
+        self.assertEqual(sorted(results), ["stm32f401", "stm32f411"])
+        results = dma.solve_all(self.devices.values(), signals + [("adc", 1, None)])
+        self.assertEqual(results, {})
@@ -0,0 +1,72 @@
+import os
+
+import lxml.etree
+
+from modm_devices.device_file import DeviceFile
+from modm_devices.parser import DeviceParser
+
+DEVICES_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "devices")
+
+DEVICE_TEMPLATE = """<?xml version='1.0' encoding='UTF-8'?>
+<modm version="0.4.0">
+  <!-- WARNING: This file is generated by the modm device file generator. Do not edit! -->
+  <device {identifiers}>
+    <naming-schema>{schema}</naming-schema>
+{nodes}
+  </device>
+</modm>
+"""
+
+# Shared gpio driver of the stm32f4{01|11}{c|r} test devices
+GPIO_DRIVER = """
+    <driver name="gpio" type="stm32">
+      <gpio port="a" pin="2">
+        <signal af="7" driver="usart" instance="2" name="tx"/>
+        <signal af="2" driver="tim" instance="5" name="ch3"/>
+        <signal driver="adc" instance="1" name="in2"/>
+      </gpio>
+      <gpio port="a" pin="3">
+        <signal af="7" driver="usart" instance="2" name="rx"/>
+        <signal af="2" driver="tim" instance="5" name="ch4"/>
+      </gpio>
+      <gpio device-pin="r" port="d" pin="5">
+        <signal af="7" driver="usart" instance="2" name="tx"/>
+      </gpio>
+      <gpio port="b" pin="0">
+        <signal af="0" name="mco"/>
+      </gpio>
+    </driver>"""
+
+
+def device_xml(nodes, **identifiers):
+    """
+    Returns a device file with the identifiers in naming schema order and
+    these nodes, which defaults to the stm32f4{01|11}{c|r} devices.
+    """
+    identifiers = identifiers or {"platform": "stm32", "family": "f4", "name": "01|11", "pin": "c|r"}
+    return DEVICE_TEMPLATE.format(
+            identifiers=" ".join('{}="{}"'.format(k, v) for k, v in identifiers.items()),
+            schema="".join("{" + k + "}" for k in identifiers),
+            nodes=nodes)
+
+
+def device_file(nodes, filename="test.xml", **identifiers):
+    """
+    Returns the DeviceFile of `device_xml()` without parsing a file.
+    """
+    rootnode = lxml.etree.fromstring(device_xml(nodes, **identifiers).encode("utf-8"))
+    return DeviceFile(filename, rootnode)
+
+
+def parse_device_file(*path):
+    """
+    Parses a shipped device file by its path in the devices folder.
+    """
+    return DeviceParser().parse(os.path.join(DEVICES_PATH, *path))
+
+
+def devices_of(device_file):
+    """
+    Returns the devices of this device file by partname.
+    """
+    return {d.partname: d for d in device_file.get_devices()}
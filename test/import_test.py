@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTED_MODULES = """
+import sys
+import modm_devices
+print(sorted(m for m in sys.modules if m.startswith("modm_devices.")), "lxml" in sys.modules)
+"""
+
+LAZY_MODULES = """
+import sys
+import modm_devices
+modm_devices.__version__
+modm_devices.naturalkey("stm32f407vgt6")
+modm_devices.device_index.default_index()
+print("lxml" in sys.modules, "modm_devices.parser" in sys.modules)
+modm_devices.parser
+print("lxml" in sys.modules, "modm_devices.parser" in sys.modules)
+"""
+
+def run(code):
+    return subprocess.check_output([sys.executable, "-c", code], cwd=ROOT).decode().split()
+
+
+class ImportTest(unittest.TestCase):
+
+    def test_lazy_modules(self):
+        self.assertEqual(run(LAZY_MODULES), ["False", "False", "True", "True"])
+
+    def test_import(self):
+        # The package itself imports none of its submodules
+        self.assertEqual(run(IMPORTED_MODULES), ["[]", "False"])
+
+    def test_attributes(self):
+        import modm_devices
+        self.assertIn("Database", dir(modm_devices))
+        self.assertIs(modm_devices.lookup, modm_devices.device_index.lookup)
+        self.assertTrue(all(hasattr(modm_devices, name) for name in modm_devices.__all__))
+        with self.assertRaises(AttributeError):
+            modm_devices.unknown
@@ -0,0 +1,44 @@
+import unittest
+
+from modm_devices.memory_map import MemoryMap
+
+from .helpers import devices_of, parse_device_file
+
+class MemoryMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.device = devices_of(parse_device_file("stm32", "stm32f4-05_07_15_17.xml"))["stm32f407vgt6"]
+
+    def test_lookup(self):
+        memory_map = MemoryMap.from_device(self.device)
+        self.assertEqual(memory_map.lookup(0x08000000)["name"], "flash")
+        self.assertEqual(memory_map.lookup(0x080fffff)["name"], "flash")
+        self.assertIsNone(memory_map.lookup(0x08100000))
+        self.assertIsNone(memory_map.lookup(0x07ffffff))
+        self.assertEqual(memory_map.lookup(0x2001bfff)["name"], "sram1")
+        self.assertEqual(memory_map.lookup(0x2001c000)["name"], "sram2")
+        self.assertIsNone(memory_map.lookup(0x20020000))
+
+    def test_lookup_all(self):
+        peripherals = [{"name": "apb2", "start": 0x40010000, "size": 0x8400},
+                       {"name": "usart1", "start": 0x40011000, "size": 0x400},
+                       {"name": "usart6", "start": "0x40011400", "size": "0x400"}]
+        memory_map = MemoryMap.from_device(self.device, peripherals)
+        regions = memory_map.lookup_all([0x40010000, 0x40011000, 0x400113ff, 0x40011400,
+                                         0x40011800, 0x40018400, 0x10000000, 0])
+        self.assertEqual([r and r["name"] for r in regions],
+                         ["apb2", "usart1", "usart1", "usart6", "apb2", None, "ccm", None])
+
+        memory_map.add({"name": "sram", "start": 0x20000000, "size": 0x20000})
+        self.assertEqual(memory_map.lookup(0x2001c000)["name"], "sram2")
+        self.assertEqual(memory_map.lookup(0x2001ffff)["name"], "sram2")
+
+    def test_without_addresses(self):
+        # The AVR memories are separate address spaces without a start
+        device = devices_of(parse_device_file("avr", "atmega-1284-n_p.xml"))["atmega1284p-au"]
+        memory_map = MemoryMap.from_device(device)
+        self.assertEqual(memory_map.regions, [])
+        self.assertIsNone(memory_map.lookup(0x100))
+
+        memory_map = MemoryMap.from_device(device, [{"name": "porta", "start": 0x20, "size": 3}])
+        self.assertEqual(memory_map.lookup(0x22)["name"], "porta")
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from modm_devices.parser import Parser, DeviceParser
+from modm_devices.exception import ParserException
+
+from .helpers import DEVICES_PATH
+
+class ParserTest(unittest.TestCase):
+
+    def test_schema_is_compiled_once(self):
+        parser = DeviceParser()
+        self.assertFalse(parser.validate)
+        schema = Parser.get_schema(parser.xsdfile)
+        self.assertIs(Parser.get_schema(DeviceParser(validate=True).xsdfile), schema)
+
+    def test_parse(self):
+        device_file = DeviceParser().parse(os.path.join(DEVICES_PATH, "rp", "rp2040.xml"))
+        self.assertEqual(device_file.rootnode.tag, "modm")
+        self.assertRaises(ParserException,
+                          lambda: DeviceParser().parse(os.path.join(DEVICES_PATH, "none.xml")))
+
+    def test_validate_shipped_files(self):
+        parser = DeviceParser(validate=True)
+        for filename in ["avr/atmega-1284-n_p.xml", "nrf/nrf52840.xml", "rp/rp2040.xml",
+                         "sam/samd21.xml", "stm32/stm32f4-01_11.xml"]:
+            device_file = parser.parse(os.path.join(DEVICES_PATH, filename))
+            self.assertTrue(device_file.get_devices())
+
+    def test_validate_invalid_file(self):
+        content = ('<modm version="0.4.0"><device platform="stm32" family="f4">'
+                   '<naming-schema>{platform}{family}</naming-schema>'
+                   '<driver type="stm32"/></device></modm>')
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "invalid.xml")
+            with open(filename, "w") as device_file:
+                device_file.write(content)
+            self.assertTrue(DeviceParser().parse(filename).get_devices())
+            self.assertRaises(ParserException,
+                              lambda: DeviceParser(validate=True).parse(filename))
@@ -0,0 +1,57 @@
+import unittest
+
+from modm_devices import pinmux
+from modm_devices.exception import ParserException
+
+from .helpers import GPIO_DRIVER, device_file, devices_of, parse_device_file
+
+class PinMuxTest(unittest.TestCase):
+
+    def setUp(self):
+        self.devices = devices_of(device_file(GPIO_DRIVER))
+
+    def test_solve(self):
+        device = self.devices["stm32f401r"]
+        assignment = pinmux.solve(device, [("usart", 2, "tx"), ("tim", "5", "ch3"), (None, None, "mco")])
+        self.assertEqual(assignment, {
+            ("usart", 2, "tx"): {"port": "d", "pin": "5", "af": "7"},
+            ("tim", "5", "ch3"): {"port": "a", "pin": "2", "af": "2"},
+            (None, None, "mco"): {"port": "b", "pin": "0", "af": "0"}})
+
+        self.assertIsNone(pinmux.solve(device, [("usart", 2, "tx"), ("tim", 5, "ch3")],
+                                       reserved=[("d", 5)]))
+        self.assertIsNone(pinmux.solve(device, [("usart", 3, "tx")]))
+        self.assertEqual(pinmux.solve(device, []), {})
+        self.assertRaises(ParserException, lambda: pinmux.solve(device, [("usart", "tx")]))
+
+    def test_normalize(self):
+        device = self.devices["stm32f401r"]
+        # Both spellings are the same signal and get the same pin
+        assignment = pinmux.solve(device, [("usart", 2, "tx"), ("usart", "2", "tx"), ("tim", 5, "ch3")])
+        self.assertEqual(assignment[("usart", 2, "tx")], {"port": "d", "pin": "5", "af": "7"})
+        self.assertIs(assignment[("usart", "2", "tx")], assignment[("usart", 2, "tx")])
+        self.assertIsNone(pinmux.solve(device, [("usart", 2, "tx"), ("tim", 5, "ch3")],
+                                       reserved=[("D", 5)]))
+
+    def test_remap(self):
+        device = devices_of(parse_device_file("stm32", "stm32f1-03-8_b.xml"))["stm32f103rbt6"]
+        self.assertEqual(pinmux.solve(device, [("usart", 2, "tx")]),
+                         {("usart", 2, "tx"): {"port": "a", "pin": "2", "remap": "0"}})
+        # Reserving PA9 remaps both usart1 signals, which moves i2c1 as well
+        assignment = pinmux.solve(device, [("usart", 1, "tx"), ("usart", 1, "rx"),
+                                           ("i2c", 1, "scl"), ("i2c", 1, "sda")], reserved=[("A", 9)])
+        self.assertEqual([(p["port"] + p["pin"], p["remap"]) for p in assignment.values()],
+                         [("b6", "1"), ("b7", "1"), ("b8", "1"), ("b9", "1")])
+        # The remapped signals of an instance cannot mix remap groups
+        self.assertIsNone(pinmux.solve(device, [("usart", 1, "tx"), ("usart", 1, "rx")],
+                                       reserved=[("a", 9), ("b", 7)]))
+        # usart1 ck has no remap groups and is combined with any group
+        self.assertEqual(len(pinmux.solve_all([device], [("usart", 1, "tx"), ("usart", 1, "ck")])), 1)
+
+    def test_solve_all(self):
+        signals = [("usart", 2, "tx"), ("usart", 2, "rx"), ("tim", 5, "ch3")]
+        for jobs in [1, 2]:
+            results = pinmux.solve_all(self.devices.values(), signals, jobs=jobs)
+            # tim5 ch3 takes PA2, so only the r pin variants fit usart2 tx on PD5
+            self.assertEqual(list(results), ["stm32f401r", "stm32f411r"])
+            self.assertEqual(results["stm32f401r"][("usart", 2, "rx")]["pin"], "3")
@@ -0,0 +1,45 @@
+import os
+import unittest
+
+from modm_devices.database import Database
+from modm_devices.exception import ParserException
+from modm_devices.search import DeviceSearch
+
+from .helpers import DEVICES_PATH
+
+class DeviceSearchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        filenames = [os.path.join(DEVICES_PATH, name) for name in
+                     ["rp/rp2040.xml", "nrf/nrf52840.xml", "stm32/stm32f4-01_11.xml"]]
+        cls.search = DeviceSearch(Database(filenames, cache=None))
+
+    def test_columns(self):
+        index = self.search.partnames.index("stm32f411ret6")
+        self.assertEqual(self.search.values("flash")[index], 512*1024)
+        self.assertEqual(self.search.values("ram")[index], 128*1024)
+        self.assertEqual(self.search.values("pins")[index], 64)
+        index = self.search.partnames.index("rp2040")
+        self.assertEqual(self.search.values("ram")[index], 264*1024)
+        self.assertEqual(self.search.values("pins")[index], -1)
+
+    def test_find(self):
+        self.assertEqual(self.search.find(("flash", ">=", 512*1024), ("ram", ">=", 128*1024),
+                                          ("pins", "<=", 64), ("pins", ">", 48)),
+                         ["stm32f411cey3", "stm32f411cey6", "stm32f411cey7",
+                          "stm32f411ret6", "stm32f411ret7"])
+        self.assertEqual(self.search.find(("flash", "==", 1024*1024)), ["nrf52840-xxaa"])
+        # unknown values never match
+        self.assertEqual(self.search.count(("pins", "!=", 64)), 44)
+        self.assertEqual(self.search.count(), len(self.search))
+        self.assertEqual(self.search.find(("ram", "<", 0)), [])
+        self.assertRaises(ParserException, lambda: self.search.find(("size", ">", 0)))
+        self.assertRaises(ParserException, lambda: self.search.find(("ram", "~", 0)))
+
+    def test_drivers(self):
+        self.assertEqual(self.search.find(drivers=["pio"]), ["rp2040"])
+        self.assertEqual(self.search.find(drivers=["usb", "dma:rp20"]), ["rp2040"])
+        self.assertEqual(self.search.count(drivers=["tim:stm32-adv*"]), 55)
+        self.assertEqual(self.search.count(("pins", "==", 100), drivers=["tim:stm32-advanced"]), 20)
+        self.assertEqual(self.search.find(drivers=["fdcan"]), [])
@@ -5,12 +5,31 @@
 # All rights reserved.
 # TESTING:  exec(open("./sam_generator.py").read())
 
+import multiprocessing
 from pathlib import Path
 from .merger import DeviceMerger
 from .output.device_file import DeviceFileWriter
 from modm_devices.parser import DeviceParser
 
-def run(output, devices, groups, filename, check_merge=False):
+def extract(function, items, jobs=1):
+    """
+    Calls `function(item)` for all items and returns the results in order.
+    With `jobs > 1` the calls are fanned out over a pool of worker processes,
+    so both the items and the results must be picklable. Platforms without
+    `fork` run the calls sequentially.
+    """
+    items = list(items)
+    if jobs is None or jobs <= 0:
+        jobs = multiprocessing.cpu_count()
+    jobs = min(jobs, len(items))
+    # Fork the workers so they inherit the loaded vendor data and the
+    # logger configuration instead of re-importing the generator script.
+    if jobs <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return [function(item) for item in items]
+    with multiprocessing.get_context("fork").Pool(jobs) as pool:
+        return pool.map(function, items, chunksize=1)
+
+def run(output, devices, groups, filename, check_merge=False, binary=False):
     def localpath(path):
         return Path(__file__).resolve().parents[1] / path
 
@@ -25,7 +44,7 @@ def run(output, devices, groups, filename, check_merge=False):
     parsed_devices = {}
     for dev in mergedDevices:
         # dump the merged device file into the devices folder
-        path = DeviceFileWriter.write(dev, output, filename)
+        path = DeviceFileWriter.write(dev, output, filename, binary)
         if check_merge:
             # immediately parse this file
             device_file = parser.parse(path)
@@ -5,9 +5,13 @@
 
 import os
 import logging
+import itertools
 
 from lxml import etree
 
+import modm_devices.binary
+from modm_devices.device_identifier import NamingSchema
+
 from ..device_tree import DeviceTree
 
 LOGGER = logging.getLogger('dfg.output.xml')
@@ -31,12 +35,9 @@ class DeviceFileWriter:
         schema = etree.Element('naming-schema')
         schema.text = tree.ids.naming_schema
         device.append(schema)
-        # compute all invalid identifier string combinations
-        invalid = sorted([did.string for did in tree.ids.product() if did not in tree.ids])
-        valid = sorted([did.string for did in tree.ids])
-        # choose the shorter list
-        invalid_list = (len(invalid) < len(valid))
-        for did in (invalid if invalid_list else valid):
+        # choose the shorter list of valid or invalid identifier strings
+        invalid_list, names = DeviceFileWriter._device_names(tree.ids)
+        for did in names:
             dev = etree.Element('invalid-device' if invalid_list else 'valid-device')
             dev.text = did
             device.append(dev)
@@ -44,17 +45,52 @@ class DeviceFileWriter:
         DeviceFileWriter._to_etree(tree, device)
         return root
 
+    @staticmethod
+    def _device_names(ids):
+        """
+        Counts the invalid identifiers in the product of all identifier
+        values without constructing the product, and only enumerates them
+        if there are fewer invalid than valid identifiers.
+
+        Returns:
+            (True, sorted invalid strings) or (False, sorted valid strings)
+        """
+        keys = ids.keys()
+        values = [ids.getAttribute(k) for k in keys]
+        naming_schema = ids.naming_schema
+        # The identifiers that are part of the product, as tuples of values
+        inside = {tuple(did[k] for k in keys) for did in ids
+                  if did.naming_schema == naming_schema and
+                     all(did[k] is not None for k in keys)}
+
+        count = 1
+        for kvalues in values:
+            count *= len(kvalues)
+        if count - len(inside) < len(ids):
+            schema = NamingSchema.get(naming_schema)
+            invalid = (schema.format(dict(zip(keys, attr)))
+                       for attr in itertools.product(*values) if attr not in inside)
+            return (True, sorted(invalid))
+        return (False, sorted(did.string for did in ids))
+
     @staticmethod
     def _to_etree(tree, root):
         root_ids = tree.ids
         for k in root_ids.keys():
             root.set(k, "|".join(root_ids.getAttribute(k)))
+        # Many nodes share the same identifiers as their siblings, so the
+        # minimal subtract sets are memoized by (ids, parent ids).
+        diff_cache = {}
         for child in tree.children:
-            DeviceFileWriter._to_etree_iter(root_ids, child, root)
+            DeviceFileWriter._to_etree_iter(root_ids, child, root, diff_cache)
 
     @staticmethod
-    def _to_etree_iter(root_ids, tree, parent):
-        diffs = tree.ids.minimal_subtract_set(root_ids, tree.parent.ids)
+    def _to_etree_iter(root_ids, tree, parent, diff_cache):
+        signature = (tuple(tree.ids), tuple(tree.parent.ids))
+        diffs = diff_cache.get(signature)
+        if diffs is None:
+            diffs = tree.ids.minimal_subtract_set(root_ids, tree.parent.ids)
+            diff_cache[signature] = diffs
 
         for diff in diffs:
             me = etree.SubElement(parent, tree.name)
@@ -75,19 +111,24 @@ class DeviceFileWriter:
                 me.set('value', tree['value'])
 
             for child in tree.children:
-                DeviceFileWriter._to_etree_iter(root_ids, child, me)
+                DeviceFileWriter._to_etree_iter(root_ids, child, me, diff_cache)
 
     @staticmethod
-    def format(tree):
-        return etree.tostring(DeviceFileWriter.toEtree(tree),
+    def format(tree, root=None):
+        return etree.tostring(DeviceFileWriter.toEtree(tree) if root is None else root,
                               encoding="UTF-8",
                               pretty_print=True,
                               xml_declaration=True)
 
     @staticmethod
-    def write(tree, folder, name):
+    def write(tree, folder, name, binary=False):
+        """
+        Writes the XML device file, and with `binary` also its compact binary
+        serialization next to it, see `modm_devices.binary`.
+        """
         path = os.path.join(str(folder), name(tree.ids) + '.xml')
-        content = DeviceFileWriter.format(tree).decode('utf-8')
+        root = DeviceFileWriter.toEtree(tree)
+        content = DeviceFileWriter.format(tree, root).decode('utf-8')
 
         if os.path.exists(path):
             LOGGER.warning("Overwriting file '%s'", os.path.basename(path))
@@ -95,4 +136,6 @@ class DeviceFileWriter:
             LOGGER.info("New XML file: '%s'", os.path.basename(path))
         with open(path, 'w') as device_file:
             device_file.write(content)
+        if binary:
+            modm_devices.binary.dump(root, modm_devices.binary.filename_of(path), path)
         return path
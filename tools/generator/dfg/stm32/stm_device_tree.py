@@ -186,7 +186,6 @@ class STMDeviceTree:
         instances = [m[1] for m in modules]
         # print("\n".join(str(m) for m in modules))
 
-        p["stm_header"] = stm_header
         p["interrupts"] = stm_header.get_interrupt_table()
         # Flash latency table
         p["flash_latency"] = stm.getFlashLatencyForDevice(did)
@@ -828,6 +827,13 @@ class STMDeviceTree:
                 child.setAttribute("value", instance)
 
     @staticmethod
-    def from_partname(partname):
-        devices = STMDeviceTree._properties_from_partname(partname)
+    def properties_from_partname(partname):
+        return STMDeviceTree._properties_from_partname(partname)
+
+    @staticmethod
+    def from_properties(devices):
         return [STMDeviceTree._device_tree_from_properties(d) for d in devices]
+
+    @staticmethod
+    def from_partname(partname):
+        return STMDeviceTree.from_properties(STMDeviceTree.properties_from_partname(partname))
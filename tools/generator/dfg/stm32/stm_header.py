@@ -2,6 +2,7 @@
 # Copyright (c) 2018, Niklas Hauser
 # All rights reserved.
 
+import os
 import re
 import sys
 import logging
@@ -134,14 +135,19 @@ class STMHeader:
             LOGGER.info("Generating {} ...".format(destination.name))
             substitutions = {"header": self.header_file, "defines": sorted(defines)}
             content = Environment().from_string(HEADER_TEMPLATE).render(substitutions)
+            # Parallel generator jobs may compile the same header, so write and
+            # compile into process-local files and atomically move them into place.
             # write the cpp file into the cache
             destination.parent.mkdir(exist_ok=True, parents=True)
-            destination.write_text(content)
+            source = destination.with_name("{}.{}.cpp".format(destination.stem, os.getpid()))
+            source.write_text(content)
+            os.replace(str(source), str(destination))
             # compile file into an executable
+            compiled = executable.with_name("{}.{}".format(executable.name, os.getpid()))
             includes = [str(STMHeader.CMSIS_PATH.absolute()), str(self.cmsis_folder.absolute())]
             gcc_command = ["g++", "-Wno-narrowing",
                 "-I{}".format(" -I".join(includes)),
-                "-o {}".format(executable),
+                "-o {}".format(compiled),
                 str(destination)
             ]
             LOGGER.info("Compiling {} ...".format(destination.name))
@@ -149,6 +155,7 @@ class STMHeader:
             if retval.returncode:
                 LOGGER.error("Header compilation failed! {}".format(retval));
                 return None
+            os.replace(str(compiled), str(executable))
         # execute the file
         LOGGER.info("Running {} ...".format(executable.name))
         retval = subprocess.run([str(executable)], stdout=subprocess.PIPE)
@@ -16,6 +16,8 @@ from dfg.stm32.stm_groups import stm_groups
 arg = argparse.ArgumentParser(description="Device File Memory Maps")
 arg.add_argument("--log-level", default="INFO", nargs="?", choices=["ERROR", "WARNING", "INFO", "DEBUG", "DISABLED"], help="Choose the output log level")
 arg.add_argument("--check-merge", default=False, action="store_true", help="Brute-force check the merge algorithm")
+arg.add_argument("--jobs", "-j", default=1, type=int, help="Number of processes used to extract the device data, 0 uses all cores")
+arg.add_argument("--binary", default=False, action="store_true", help="Also write the binary device files")
 arg.add_argument("filter", nargs = "*", help="Only consider devices starting with this string")
 args = arg.parse_args()
 dfg.logger.configure_logger(args.log_level)
@@ -26,8 +28,10 @@ for f in args.filter:
 deviceNames = sorted(list(set(deviceNames)))
 
 devices = {}
-for deviceName in deviceNames:
-    for device in STMDeviceTree.from_partname(deviceName):
+# Extract the raw properties in parallel, the device trees themselves are not
+# picklable, so they are built here.
+for properties in dfg.generator.extract(STMDeviceTree.properties_from_partname, deviceNames, args.jobs):
+    for device in STMDeviceTree.from_properties(properties):
         devices[device.ids.string] = device
 
 def filename(ids):
@@ -45,5 +49,5 @@ def filename(ids):
     return fmt.format(**p)
 
 dfg.generator.run(output="stm32", devices=devices, groups=stm_groups,
-                  filename=filename, check_merge=args.check_merge)
+                  filename=filename, check_merge=args.check_merge, binary=args.binary)
 
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Writes the binary serialization of every device file next to it, which the
+DeviceParser prefers over the XML file while the XML content is unchanged.
+
+The binary files are derived from the XML files and are not committed, they
+are only built for the distribution packages.
+"""
+
+import glob
+import os
+import sys
+
+rootpath = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..")
+sys.path.insert(0, rootpath)
+
+from modm_devices import binary
+from modm_devices.parser import Parser
+
+if __name__ == "__main__":
+    filenames = sorted(glob.glob(os.path.join(rootpath, "devices", "**", "*.xml"), recursive=True))
+    for filename in filenames:
+        rootnode = Parser.validate_and_parse_xml(filename, None)
+        binary.dump(rootnode, binary.filename_of(filename), filename)
+    print("Wrote {} binary device files.".format(len(filenames)))
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measures the time of `import modm_devices` in fresh interpreters, which
+should stay below 50ms, since the CLI wrappers import the package only to
+print a version or look up a partname.
+"""
+
+import os
+import subprocess
+import sys
+
+rootpath = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..")
+
+IMPORT_TIME = """
+import time
+start = time.perf_counter()
+import modm_devices
+print(time.perf_counter() - start)
+"""
+
+def measure(runs=10):
+    durations = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", IMPORT_TIME], cwd=rootpath)
+        durations.append(float(output))
+    return durations
+
+if __name__ == "__main__":
+    durations = sorted(measure())
+    print("import modm_devices: best {:.1f}ms, median {:.1f}ms".format(
+          durations[0] * 1000, durations[len(durations) // 2] * 1000))
+    sys.exit(0 if durations[0] < 0.05 else 1)
@@ -9,6 +9,7 @@ from collections import defaultdict
 rootpath = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..")
 sys.path.append(rootpath)
 import modm_devices.parser
+import modm_devices.device_index
 
 TABLE_TEMPLATE = """
 | Family        | Devices | Family        | Devices | Family        | Devices |
@@ -30,8 +31,11 @@ def extract(text, key):
 if __name__ == "__main__":
     devices_short = set()
     devices = []
-    for filename in Path(rootpath).glob("devices/**/*.xml"):
-        for d in modm_devices.parser.DeviceParser().parse(str(filename)).get_devices():
+    device_files = []
+    for filename in sorted(Path(rootpath).glob("devices/**/*.xml")):
+        device_file = modm_devices.parser.DeviceParser().parse(str(filename))
+        device_files.append(device_file)
+        for d in device_file.get_devices():
             short_device = d.identifier.string.split("@")[0]
             if short_device not in devices_short:
                 devices_short.add(short_device)
@@ -53,5 +57,10 @@ if __name__ == "__main__":
     readme = replace(readme, "devicecount", sum(families.values()))
     readme_path.write_text(readme)
 
+    # Update the partname index shipped with the package
+    index = modm_devices.device_index.DeviceIndex.from_device_files(
+            device_files, Path(rootpath) / "devices")
+    index.write(modm_devices.device_index.INDEXFILE)
+
 
 